@@ -55,8 +55,9 @@ class EmbeddingGenerator:
             dimension=1408
         )
         
-        # Convert to numpy and normalize
-        embedding_array = np.array(embeddings.image_embedding)
-        normalized_embedding = embedding_array / np.linalg.norm(embedding_array)
+        # Convert to float32 numpy and normalize in place, using a dot product
+        # for the norm instead of the heavier np.linalg.norm dispatch
+        embedding_array = np.asarray(embeddings.image_embedding, dtype=np.float32)
+        embedding_array *= np.float32(1.0) / np.sqrt(embedding_array @ embedding_array)
         
-        return normalized_embedding
\ No newline at end of file
+        return embedding_array
\ No newline at end of file
@@ -0,0 +1,139 @@
+import os
+from unittest import mock
+
+import numpy as np
+import pytest
+from google.api_core.exceptions import ServiceUnavailable
+
+import vector_store
+from vector_store import (
+    EMBEDDING_DIMENSION,
+    UPSERT_MAX_FLUSH_ATTEMPTS,
+    RowNotStagedError,
+    VectorSearchClient,
+)
+
+
+def make_client(buffer_size=2):
+    """VectorSearchClient built by its real constructor, with the GCP clients mocked"""
+    env = {
+        "PROJECT_ID": "project",
+        "REGION": "us-central1",
+        "PROCESSED_BUCKET": "bucket",
+        "VECTOR_SEARCH_INDEX": "index",
+        "UPSERT_BUFFER_SIZE": str(buffer_size),
+    }
+    with mock.patch.dict(os.environ, env, clear=True), \
+            mock.patch.object(vector_store, "aiplatform") as aiplatform, \
+            mock.patch.object(vector_store.storage, "Client"), \
+            mock.patch.object(vector_store.firestore, "Client"), \
+            mock.patch.object(vector_store, "IndexServiceGrpcTransport"), \
+            mock.patch.object(vector_store, "IndexServiceClient"):
+        aiplatform.MatchingEngineIndex.return_value.resource_name = "index"
+        return VectorSearchClient()
+
+
+def unit_vector(seed):
+    vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIMENSION).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_add_rejects_unnormalized_embedding_without_staging():
+    client = make_client()
+    with pytest.raises(ValueError):
+        client.add(unit_vector(0) * 2, "a.jpg", {})
+    assert client._buf_n == 0
+
+
+def test_add_after_failed_flush_does_not_replay_dropped_rows():
+    client = make_client()
+    with mock.patch.object(client, "bulk_upsert_embeddings", side_effect=RuntimeError("firestore down")):
+        client.add(unit_vector(0), "a.jpg", {})
+        with pytest.raises(RuntimeError):
+            client.add(unit_vector(1), "b.jpg", {})
+    assert client._buf_n == 0
+
+    with mock.patch.object(client, "bulk_upsert_embeddings", return_value=["c", "d"]) as bulk:
+        assert client.add(unit_vector(2), "c.jpg", {}) == []
+        assert client.add(unit_vector(3), "d.jpg", {}) == ["c", "d"]
+    bulk.assert_called_once()
+    assert bulk.call_args.args[1] == ["c.jpg", "d.jpg"]
+
+
+def test_transient_flush_failures_are_retried_then_dropped():
+    client = make_client(buffer_size=1)
+    with mock.patch.object(client, "bulk_upsert_embeddings", side_effect=ServiceUnavailable("busy")) as bulk:
+        with pytest.raises(ServiceUnavailable):
+            client.add(unit_vector(0), "a.jpg", {})
+        # The full buffer is retried before the next row is staged
+        for _ in range(UPSERT_MAX_FLUSH_ATTEMPTS - 1):
+            assert client._buf_n == 1
+            with pytest.raises(RowNotStagedError) as excinfo:
+                client.add(unit_vector(1), "b.jpg", {})
+            assert isinstance(excinfo.value.__cause__, ServiceUnavailable)
+    assert bulk.call_count == UPSERT_MAX_FLUSH_ATTEMPTS
+    assert all(call.args[1] == ["a.jpg"] for call in bulk.call_args_list)
+    assert client._buf_n == 0
+
+
+def test_add_returns_ids_from_successful_retry_and_stages_its_row():
+    client = make_client(buffer_size=2)
+    with mock.patch.object(client, "bulk_upsert_embeddings", side_effect=ServiceUnavailable("busy")):
+        client.add(unit_vector(0), "a.jpg", {})
+        with pytest.raises(ServiceUnavailable):
+            client.add(unit_vector(1), "b.jpg", {})
+    assert client._buf_n == 2
+
+    with mock.patch.object(client, "bulk_upsert_embeddings", return_value=["a", "b"]) as bulk:
+        assert client.add(unit_vector(2), "c.jpg", {}) == ["a", "b"]
+    bulk.assert_called_once()
+    assert bulk.call_args.args[1] == ["a.jpg", "b.jpg"]
+    assert client._buf_paths[:client._buf_n] == ["c.jpg"]
+
+
+def test_retried_flush_keeps_metadata_serializable():
+    client = make_client(buffer_size=1)
+    client._stub.upsert_datapoints.side_effect = [ServiceUnavailable("busy"), None]
+    metadata = {"context": "beach"}
+
+    with pytest.raises(ServiceUnavailable):
+        client.add(unit_vector(0), "a.jpg", metadata)
+    assert "created_at" not in metadata
+
+    # The retry re-serializes the same metadata for the GCS backup
+    ids = client.flush()
+    assert len(ids) == 1 and client._buf_n == 0
+
+
+def test_adaptive_upsert_halves_on_resource_exhausted_and_publishes_size(monkeypatch):
+    from google.api_core.exceptions import ResourceExhausted
+
+    monkeypatch.setattr(vector_store.time, "sleep", lambda _: None)
+    client = make_client()
+    client.upsert_batch_size = 8
+    sizes = []
+
+    def upsert(request):
+        sizes.append(len(request.datapoints))
+        if len(sizes) == 1:
+            raise ResourceExhausted("slow down")
+
+    client._stub.upsert_datapoints.side_effect = upsert
+    client._upsert_datapoints_adaptive([vector_store.IndexDatapoint(datapoint_id=str(i)) for i in range(10)])
+    assert sizes == [8, 4, 6]
+    assert client.upsert_batch_size == 16
+
+
+def test_bulk_upsert_batches_metadata_writes_and_uploads_backups():
+    client = make_client()
+    client.metadata_cache = mock.MagicMock()
+    embeddings = np.stack([unit_vector(i) for i in range(3)])
+
+    ids = client.bulk_upsert_embeddings(embeddings, ["a.jpg", "b.jpg", "c.jpg"], [{}, {}, {}])
+
+    batch = client.db.batch.return_value
+    client.db.batch.assert_called_once()
+    assert batch.set.call_count == 3
+    batch.commit.assert_called_once()
+    assert client.bucket.blob.call_count == 3
+    client.metadata_cache.delete.assert_called_once_with(*[f"index_metadata:{id}" for id in ids])
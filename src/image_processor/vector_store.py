@@ -15,19 +15,66 @@
 """
 
 from google.cloud import aiplatform
+from google.cloud.aiplatform_v1 import IndexServiceClient, UpsertDatapointsRequest, IndexDatapoint
+from google.cloud.aiplatform_v1.services.index_service.transports import IndexServiceGrpcTransport
 from google.cloud import storage
 from google.cloud import firestore
+from google.api_core.exceptions import DeadlineExceeded, ResourceExhausted, ServiceUnavailable
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 import os
 import json
 import logging
-import uuid
+import random
+import threading
+import time
+import redis
+from blake3 import blake3
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# gRPC channel options for the index service stub: keep the HTTP/2 connection
+# warm between upserts and lift the default 4 MB cap on outgoing messages so
+# large datapoint batches fit in a single request
+GRPC_CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.max_send_message_length", -1),
+    ("grpc.max_receive_message_length", -1),
+]
+
+# Dimension of the multimodal embeddings produced by EmbeddingGenerator
+EMBEDDING_DIMENSION = 1408
+
+# Adaptive upsert batching: start at the initial size, double on success and
+# halve on RESOURCE_EXHAUSTED / DEADLINE_EXCEEDED, never exceeding the cap
+UPSERT_BATCH_SIZE_INITIAL = 100
+UPSERT_BATCH_SIZE_CAP = 1000
+UPSERT_MAX_RETRIES = 6
+UPSERT_BACKOFF_BASE_SECONDS = 0.5
+UPSERT_BACKOFF_MAX_SECONDS = 30.0
+
+# Errors after which add() keeps the staged rows for another flush attempt;
+# anything else (bad input, Firestore/GCS failures) drops the buffer so a
+# failure that will always recur can't wedge ingestion
+TRANSIENT_UPSERT_ERRORS = (ResourceExhausted, DeadlineExceeded, ServiceUnavailable)
+# Flush attempts allowed for the same staged rows before they are dropped
+UPSERT_MAX_FLUSH_ATTEMPTS = 3
+
+# Bulk upserts write metadata in Firestore batches (500 writes is the
+# per-commit limit) and upload the GCS backups concurrently
+FIRESTORE_BATCH_SIZE = 500
+GCS_UPLOAD_WORKERS = 16
+
+class RowNotStagedError(RuntimeError):
+    """add() could not stage its row because retrying a full buffer failed"""
+
 class VectorSearchClient:
     def __init__(self):
         """Initialize Vector Search client"""
@@ -55,20 +102,150 @@ class VectorSearchClient:
         # Initialize Firestore client
         self.db = firestore.Client()
         
+        # Redis cache shared with the search API, invalidated on metadata writes
+        redis_url = os.environ.get('REDIS_URL')
+        self.metadata_cache = redis.Redis.from_url(redis_url) if redis_url else None
+        
         # Get the index name parts from the full resource name
         self.endpoint = aiplatform.MatchingEngineIndex(
             index_name=self.index_id
         )
-        logger.info(f"Initialized endpoint with index: {self.endpoint.resource_name}")
+        self.index_name = self.endpoint.resource_name
+        logger.info(f"Initialized endpoint with index: {self.index_name}")
+        
+        # Cache a low-level index service stub on a single long-lived channel
+        # so upserts skip the high-level SDK's per-call resource resolution
+        api_endpoint = f"{self.location}-aiplatform.googleapis.com"
+        channel = IndexServiceGrpcTransport.create_channel(
+            f"{api_endpoint}:443",
+            options=GRPC_CHANNEL_OPTIONS
+        )
+        self._stub = IndexServiceClient(
+            transport=IndexServiceGrpcTransport(host=api_endpoint, channel=channel)
+        )
+        
+        # Current datapoints-per-request, tuned by _upsert_datapoints_adaptive
+        self.upsert_batch_size = UPSERT_BATCH_SIZE_INITIAL
+        
+        # Pre-allocated staging buffer for streaming ingestion through add();
+        # filled row by row and handed to bulk_upsert_embeddings without copying
+        self.buffer_size = int(os.environ.get('UPSERT_BUFFER_SIZE', 100))
+        self._buf = np.empty((self.buffer_size, EMBEDDING_DIMENSION), dtype=np.float32)
+        self._buf_paths: List[Optional[str]] = [None] * self.buffer_size
+        self._buf_metadatas: List[Optional[Dict[str, Any]]] = [None] * self.buffer_size
+        self._buf_n = 0
+        self._buf_flush_failures = 0
+        self._buf_lock = threading.Lock()
+    
+    def _upsert_datapoints(self, datapoints: List[IndexDatapoint]) -> None:
+        """
+        Stream datapoints to the index through the cached gRPC stub
+        
+        Args:
+            datapoints: Datapoints to upsert in a single request
+        """
+        self._stub.upsert_datapoints(
+            UpsertDatapointsRequest(index=self.index_name, datapoints=datapoints)
+        )
+    
+    def _upsert_datapoints_adaptive(self, datapoints: List[IndexDatapoint]) -> None:
+        """
+        Upsert datapoints in chunks whose size adapts to server pressure
+        
+        The chunk size doubles after each successful request and halves when the
+        service reports RESOURCE_EXHAUSTED or DEADLINE_EXCEEDED, in which case the
+        chunk is retried after an exponential backoff with full jitter.
+        
+        Args:
+            datapoints: Datapoints to upsert
+        """
+        # Adapt a per-call copy so concurrent calls can't interleave updates and
+        # lose a halving; the result is published for the next call to start from
+        batch_size = self.upsert_batch_size
+        histogram = Counter()
+        start = 0
+        attempt = 0
+        while start < len(datapoints):
+            chunk = datapoints[start:start + batch_size]
+            try:
+                self._upsert_datapoints(chunk)
+            except (ResourceExhausted, DeadlineExceeded) as e:
+                attempt += 1
+                if attempt > UPSERT_MAX_RETRIES:
+                    self.upsert_batch_size = batch_size
+                    raise
+                batch_size = max(batch_size // 2, 1)
+                delay = random.uniform(
+                    0, min(UPSERT_BACKOFF_MAX_SECONDS, UPSERT_BACKOFF_BASE_SECONDS * 2 ** attempt)
+                )
+                logger.warning(
+                    f"Upsert of {len(chunk)} datapoints failed ({e.__class__.__name__}), "
+                    f"retrying with batch size {batch_size} in {delay:.2f}s"
+                )
+                time.sleep(delay)
+                continue
+            
+            histogram[len(chunk)] += 1
+            start += len(chunk)
+            attempt = 0
+            batch_size = min(batch_size * 2, UPSERT_BATCH_SIZE_CAP)
+        
+        self.upsert_batch_size = batch_size
+        logger.info(f"Upsert batch size histogram: {dict(sorted(histogram.items()))}")
+    
+    @staticmethod
+    def _check_norms(embeddings: np.ndarray, atol: float = 1e-3) -> np.ndarray:
+        """
+        Verify that every row of an (N, d) embedding matrix is L2-normalized
+        
+        Args:
+            embeddings: Embedding matrix, one vector per row
+            atol: Allowed deviation of the squared norm from 1
+            
+        Returns:
+            The squared norm of each row
+        """
+        # Row-wise dot products in a single pass instead of a per-vector loop
+        norms = np.einsum('ij,ij->i', embeddings, embeddings)
+        if not np.allclose(norms, 1.0, atol=atol):
+            bad = np.flatnonzero(~np.isclose(norms, 1.0, atol=atol))
+            raise ValueError(
+                f"Embeddings at rows {bad[:10].tolist()} are not L2-normalized"
+            )
+        return norms
     
-    def _generate_id(self) -> str:
+    @staticmethod
+    def _renormalize(embeddings: np.ndarray) -> np.ndarray:
         """
-        Generate a unique ID that's safe for both Firestore and Vector Search.
+        L2-normalize every row of an (N, d) float embedding matrix in place
         
+        Args:
+            embeddings: Embedding matrix, one vector per row
+            
+        Returns:
+            The same array, normalized
+        """
+        norms = np.einsum('ij,ij->i', embeddings, embeddings)
+        embeddings /= np.sqrt(norms)[:, None]
+        return embeddings
+    
+    def _generate_id(self, file_path: str, embedding: np.ndarray) -> str:
+        """
+        Generate a deterministic ID that's safe for both Firestore and Vector Search.
+        
+        The ID is derived from the file path and the embedding contents, so
+        retrying a failed upsert overwrites the same entries instead of
+        creating duplicates.
+        
+        Args:
+            file_path: Full path of the file
+            embedding: Embedding vector for the file
+            
         Returns:
-            A string containing a UUID4 without hyphens
+            A 32-character hex digest
         """
-        return uuid.uuid4().hex
+        vector = np.ascontiguousarray(embedding, dtype=np.float32)
+        return blake3(file_path.encode() + vector.tobytes()).hexdigest()[:32]
     
     def _extract_file_info(self, file_path: str) -> Tuple[str, str]:
         """
@@ -110,18 +287,62 @@ class VectorSearchClient:
             metadata: Metadata to store
         """
         try:
-            # Add timestamp to metadata
-            metadata['created_at'] = firestore.SERVER_TIMESTAMP
+            # Add timestamp to a copy, so the caller's metadata stays
+            # JSON-serializable if the write is retried
+            document = {**metadata, 'created_at': firestore.SERVER_TIMESTAMP}
             
             # Store in Firestore using the generated ID
             doc_ref = self.db.collection('index_metadata').document(id)
-            doc_ref.set(metadata)
+            doc_ref.set(document)
             logger.info(f"Stored metadata in Firestore for id: {id}")
             
+            self._invalidate_cached_metadata(id)
+            
         except Exception as e:
             logger.error(f"Error storing metadata in Firestore: {e}")
             raise
     
+    def _store_metadata_batch(self, metadata_by_id: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Store many metadata documents in Firestore using batched writes
+        
+        Args:
+            metadata_by_id: Metadata to store, keyed by generated identifier
+        """
+        try:
+            collection = self.db.collection('index_metadata')
+            items = list(metadata_by_id.items())
+            for start in range(0, len(items), FIRESTORE_BATCH_SIZE):
+                batch = self.db.batch()
+                for id, metadata in items[start:start + FIRESTORE_BATCH_SIZE]:
+                    # Timestamp a copy, as in _store_metadata_in_firestore
+                    batch.set(
+                        collection.document(id),
+                        {**metadata, 'created_at': firestore.SERVER_TIMESTAMP}
+                    )
+                batch.commit()
+            logger.info(f"Stored metadata in Firestore for {len(items)} ids")
+            
+            self._invalidate_cached_metadata(*metadata_by_id)
+            
+        except Exception as e:
+            logger.error(f"Error storing metadata batch in Firestore: {e}")
+            raise
+    
+    def _invalidate_cached_metadata(self, *ids: str) -> None:
+        """
+        Drop the search API's cached copies of metadata documents
+        
+        Args:
+            ids: Identifiers of the metadata documents
+        """
+        if self.metadata_cache is None or not ids:
+            return
+        try:
+            self.metadata_cache.delete(*[f"index_metadata:{id}" for id in ids])
+        except redis.RedisError as e:
+            logger.warning(f"Error invalidating cached metadata for {len(ids)} ids: {e}")
+    
     def upsert_embedding(
         self,
         embedding: np.ndarray,
@@ -140,8 +361,8 @@ class VectorSearchClient:
             The generated ID used for the embedding
         """
         try:
-            # Generate a unique ID
-            generated_id = self._generate_id()
+            # Generate a content-addressed ID
+            generated_id = self._generate_id(file_path, embedding)
             
             # Convert embedding to list if it's numpy array
             if isinstance(embedding, np.ndarray):
@@ -172,19 +393,210 @@ class VectorSearchClient:
             self._store_metadata_in_firestore(generated_id, metadata)
             
             # Prepare datapoint for streaming update
-            datapoint = {
-                "datapoint_id": generated_id,
-                "feature_vector": embedding,
-            }
+            datapoint = IndexDatapoint(
+                datapoint_id=generated_id,
+                feature_vector=embedding
+            )
             
             # Stream update to the index
-            response = self.endpoint.upsert_datapoints(
-                datapoints=[datapoint]
-            )
+            self._upsert_datapoints([datapoint])
             logger.info(f"Successfully streamed embedding with id: {generated_id}")
             
             return generated_id
             
         except Exception as e:
             logger.error(f"Error upserting embedding: {e}")
-            raise
\ No newline at end of file
+            raise
+    
+    def bulk_upsert_embeddings(
+        self,
+        embeddings: np.ndarray,
+        file_paths: List[str],
+        metadatas: List[Dict[str, Any]],
+        renormalize: bool = False
+    ) -> List[str]:
+        """
+        Upload a batch of embeddings to Vector Search in a single streaming update
+        and store their metadata in Firestore
+        
+        Args:
+            embeddings: (N, d) matrix of embedding vectors, one per file
+            file_paths: Full path of each file
+            metadatas: Additional metadata to store for each file
+            renormalize: Normalize the embeddings in place instead of rejecting
+                vectors that are not unit length
+            
+        Returns:
+            The generated IDs, in input order
+        """
+        try:
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            if embeddings.ndim != 2:
+                raise ValueError(f"Expected a 2-D embedding matrix, got shape {embeddings.shape}")
+            if not (len(embeddings) == len(file_paths) == len(metadatas)):
+                raise ValueError(
+                    "embeddings, file_paths and metadatas must have the same length"
+                )
+            
+            if renormalize:
+                if not embeddings.flags.writeable:
+                    embeddings = embeddings.copy()
+                self._renormalize(embeddings)
+            else:
+                self._check_norms(embeddings)
+            
+            generated_ids = []
+            datapoints = []
+            backups = []
+            metadata_by_id = {}
+            for embedding, file_path, metadata in zip(embeddings, file_paths, metadatas):
+                generated_id = self._generate_id(file_path, embedding)
+                vector = embedding.tolist()
+                
+                filename, full_path = self._extract_file_info(file_path)
+                metadata.update({
+                    'file_name': filename,
+                    'full_path': full_path
+                })
+                
+                backups.append(({
+                    "id": generated_id,
+                    "file_name": filename,
+                    "full_path": full_path,
+                    "embedding": vector,
+                    "metadata": metadata
+                }, f"embeddings/{generated_id}.json"))
+                metadata_by_id[generated_id] = metadata
+                
+                datapoints.append(IndexDatapoint(
+                    datapoint_id=generated_id,
+                    feature_vector=vector
+                ))
+                generated_ids.append(generated_id)
+            
+            # Backups are independent objects, so overlap the uploads
+            with ThreadPoolExecutor(
+                max_workers=max(1, min(GCS_UPLOAD_WORKERS, len(backups)))
+            ) as executor:
+                list(executor.map(lambda backup: self._upload_to_gcs(*backup), backups))
+            self._store_metadata_batch(metadata_by_id)
+            
+            self._upsert_datapoints_adaptive(datapoints)
+            logger.info(f"Successfully streamed {len(datapoints)} embeddings")
+            
+            return generated_ids
+            
+        except Exception as e:
+            logger.error(f"Error bulk upserting embeddings: {e}")
+            raise
+    
+    def add(
+        self,
+        embedding: np.ndarray,
+        file_path: str,
+        metadata: Dict[str, Any]
+    ) -> List[str]:
+        """
+        Stage an embedding in the ingestion buffer, upserting the whole buffer
+        once it is full. Safe to call from multiple writer threads.
+        
+        Args:
+            embedding: Normalized embedding vector
+            file_path: Full path of the file
+            metadata: Additional metadata to store
+            
+        Returns:
+            The generated IDs of every flush this call triggered (a retry of a
+            buffer left full by an earlier failure, then this row's own),
+            otherwise an empty list
+            
+        Raises:
+            ValueError: If the embedding has the wrong shape or is not
+                L2-normalized; nothing is staged
+            RowNotStagedError: If retrying a buffer left full by an earlier
+                failure failed again; this row was not staged and the caller
+                should add it again. The flush error is the __cause__
+        """
+        # Validate before staging, so one bad row can't fail every flush
+        embedding = np.asarray(embedding, dtype=np.float32)
+        if embedding.shape != (EMBEDDING_DIMENSION,):
+            raise ValueError(
+                f"Expected an embedding of shape ({EMBEDDING_DIMENSION},), got {embedding.shape}"
+            )
+        self._check_norms(embedding[None, :])
+        
+        generated_ids: List[str] = []
+        with self._buf_lock:
+            # A previous flush failed transiently and left the buffer full;
+            # retry it first
+            if self._buf_n == self.buffer_size:
+                try:
+                    generated_ids = self._flush()
+                except Exception as e:
+                    raise RowNotStagedError(
+                        f"Retrying the staged buffer failed, {file_path} was not staged"
+                    ) from e
+            
+            self._buf[self._buf_n] = embedding
+            self._buf_paths[self._buf_n] = file_path
+            self._buf_metadatas[self._buf_n] = metadata
+            self._buf_n += 1
+            
+            if self._buf_n == self.buffer_size:
+                generated_ids += self._flush()
+        return generated_ids
+    
+    def flush(self) -> List[str]:
+        """
+        Upsert everything currently staged in the ingestion buffer
+        
+        Returns:
+            The generated IDs for the flushed embeddings
+        """
+        with self._buf_lock:
+            return self._flush()
+    
+    def _flush(self) -> List[str]:
+        """
+        Upsert the staged rows; the caller must hold the buffer lock
+        
+        The rows stay staged after a transient RPC error, for up to
+        UPSERT_MAX_FLUSH_ATTEMPTS attempts in total; any other failure, or the
+        last allowed attempt failing, drops them.
+        """
+        n = self._buf_n
+        if not n:
+            return []
+        
+        try:
+            generated_ids = self.bulk_upsert_embeddings(
+                self._buf[:n],
+                self._buf_paths[:n],
+                self._buf_metadatas[:n]
+            )
+        except TRANSIENT_UPSERT_ERRORS:
+            self._buf_flush_failures += 1
+            if self._buf_flush_failures < UPSERT_MAX_FLUSH_ATTEMPTS:
+                logger.warning(
+                    f"Flush of {n} staged embeddings failed "
+                    f"({self._buf_flush_failures}/{UPSERT_MAX_FLUSH_ATTEMPTS}), keeping them for retry"
+                )
+                raise
+            logger.error(f"Dropping {n} staged embeddings after {self._buf_flush_failures} failed flushes")
+            self._clear_buffer()
+            raise
+        except Exception:
+            logger.error(f"Dropping {n} staged embeddings after a non-retryable flush failure")
+            self._clear_buffer()
+            raise
+        
+        self._clear_buffer()
+        return generated_ids
+    
+    def _clear_buffer(self) -> None:
+        """Empty the staging buffer; the caller must hold the buffer lock"""
+        n = self._buf_n
+        self._buf_n = 0
+        self._buf_flush_failures = 0
+        self._buf_paths[:n] = [None] * n
+        self._buf_metadatas[:n] = [None] * n
@@ -14,10 +14,11 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import os
 import logging
-from vector_search import VectorSearchService
+import orjson
+from vector_search import get_service
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -25,8 +26,33 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-# Initialize service
-service = VectorSearchService()
+# Result counts above this are streamed instead of serialized in one piece
+STREAM_THRESHOLD = 100
+
+# Initialize the shared service at import time so the first request doesn't
+# pay for client and model setup
+service = get_service()
+
+def _dumps(obj) -> bytes:
+    """Serialize to JSON, falling back to str() for types orjson doesn't know"""
+    return orjson.dumps(obj, default=str)
+
+def _serialize_result(r) -> bytes:
+    """Serialize a single search result"""
+    return _dumps({
+        'id': r.id,
+        'similarity_score': r.score,
+        'metadata': r.metadata
+    })
+
+def _stream_results(query_text: str, results):
+    """Yield the search response body one result at a time"""
+    yield b'{"query":' + _dumps(query_text) + b',"results":['
+    for i, r in enumerate(results):
+        if i:
+            yield b','
+        yield _serialize_result(r)
+    yield b']}'
 
 @app.route('/search', methods=['POST'])
 def search_by_text():
@@ -52,18 +78,11 @@ def search_by_text():
         )
 
         # Format response
-        response = {
-            'query': query_text,
-            'results': [
-                {
-                    'id': r.id,
-                    'similarity_score': r.score,
-                    'metadata': r.metadata
-                } for r in results
-            ]
-        }
-
-        return jsonify(response)
+        body = _stream_results(query_text, results)
+        if len(results) <= STREAM_THRESHOLD:
+            body = b''.join(body)
+
+        return Response(body, mimetype='application/json')
 
     except Exception as e:
         logger.error(f"Error processing search request: {e}")
@@ -0,0 +1,86 @@
+"""
+Copyright 2024 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from cachetools import LRUCache
+from typing import Dict, List, Optional
+import threading
+import logging
+import orjson
+import redis
+
+logger = logging.getLogger(__name__)
+
+class MetadataCache:
+    """
+    Two-tier cache for Firestore metadata documents.
+
+    Lookups hit an in-process LRU first, then Redis (when configured), so
+    repeated results skip the Firestore round-trip entirely.
+    """
+
+    KEY_PREFIX = "index_metadata:"
+
+    def __init__(self, maxsize: int, redis_url: Optional[str] = None, ttl: int = 86400):
+        self._local = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._ttl = ttl
+        self._redis = redis.Redis.from_url(redis_url) if redis_url else None
+
+    def _key(self, doc_id: str) -> str:
+        return f"{self.KEY_PREFIX}{doc_id}"
+
+    def get_many(self, doc_ids: List[str]) -> Dict[str, dict]:
+        """Return the cached metadata for every ID found in either tier"""
+        found = {}
+        with self._lock:
+            for doc_id in doc_ids:
+                metadata = self._local.get(doc_id)
+                if metadata is not None:
+                    found[doc_id] = metadata
+
+        missing = [doc_id for doc_id in doc_ids if doc_id not in found]
+        if missing and self._redis is not None:
+            try:
+                values = self._redis.mget([self._key(doc_id) for doc_id in missing])
+            except redis.RedisError as e:
+                logger.warning(f"Redis metadata lookup failed: {e}")
+                values = []
+
+            promoted = {}
+            for doc_id, value in zip(missing, values):
+                if value is not None:
+                    promoted[doc_id] = orjson.loads(value)
+            if promoted:
+                with self._lock:
+                    self._local.update(promoted)
+                found.update(promoted)
+
+        return found
+
+    def set_many(self, metadata_by_id: Dict[str, dict]) -> None:
+        """Store metadata in both tiers"""
+        if not metadata_by_id:
+            return
+        with self._lock:
+            self._local.update(metadata_by_id)
+
+        if self._redis is not None:
+            try:
+                pipe = self._redis.pipeline(transaction=False)
+                for doc_id, metadata in metadata_by_id.items():
+                    pipe.set(self._key(doc_id), orjson.dumps(metadata, default=str), ex=self._ttl)
+                pipe.execute()
+            except redis.RedisError as e:
+                logger.warning(f"Redis metadata store failed: {e}")
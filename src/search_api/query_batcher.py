@@ -0,0 +1,128 @@
+"""
+Copyright 2024 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Sequence
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class QueryBatcher:
+    """
+    Coalesce concurrent nearest-neighbor queries into batched calls.
+
+    Request threads submit a single query and block on its result. A collector
+    thread drains whatever is queued and splits each batch into one search call
+    per distinct num_neighbors; the calls run on a small pool, up to
+    max_concurrency at once, and fan the per-query responses back to the
+    waiting threads. A query that arrives to an empty queue is sent
+    at once; max_wait_ms only applies while other queries are queued with it.
+    While every slot is busy, new queries accumulate into the next batch.
+    """
+
+    def __init__(
+        self,
+        search_fn: Callable[[List[Sequence[float]], int], Sequence[Any]],
+        max_batch: int = 16,
+        max_wait_ms: float = 5.0,
+        max_concurrency: int = 8
+    ):
+        self._search_fn = search_fn
+        self._max_batch = max_batch
+        self._max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix="query-batch"
+        )
+        self._worker = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, query: Sequence[float], num_neighbors: int) -> Any:
+        """Queue a query and wait for its neighbors"""
+        future = Future()
+        self._queue.put((query, num_neighbors, future))
+        return future.result()
+
+    def _collect_batch(self) -> list:
+        """
+        Block for one query and take whatever else is already queued; only
+        when that finds company, keep gathering until the batch is full or
+        the window closes
+        """
+        batch = [self._queue.get()]
+        while len(batch) < self._max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if len(batch) == 1:
+            return batch
+
+        deadline = time.monotonic() + self._max_wait
+        while len(batch) < self._max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            # Wait for a free slot first, so queries that arrive while every
+            # call is in flight are batched together
+            self._slots.acquire()
+            batch = self._collect_batch()
+
+            # find_neighbors takes a single num_neighbors per call, so each
+            # group is its own call; every call after the first takes another
+            # slot, so different result sizes in one batch run side by side
+            groups = defaultdict(list)
+            for item in batch:
+                groups[item[1]].append(item)
+            for i, (num_neighbors, items) in enumerate(groups.items()):
+                if i:
+                    self._slots.acquire()
+                self._executor.submit(self._dispatch, items, num_neighbors)
+
+            if len(batch) > 1:
+                logger.debug(f"Batched {len(batch)} queries into {len(groups)} find_neighbors calls")
+
+    def _dispatch(self, items: list, num_neighbors: int) -> None:
+        """Run one search call for a group of queries and resolve their futures"""
+        try:
+            try:
+                response = self._search_fn([query for query, _, _ in items], num_neighbors)
+                if len(response) != len(items):
+                    raise RuntimeError(
+                        f"Expected {len(items)} neighbor lists, got {len(response)}"
+                    )
+            except Exception as e:
+                for _, _, future in items:
+                    future.set_exception(e)
+                return
+
+            for (_, _, future), neighbors in zip(items, response):
+                future.set_result(neighbors)
+        finally:
+            self._slots.release()
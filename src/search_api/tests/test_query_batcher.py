@@ -0,0 +1,128 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from query_batcher import QueryBatcher
+
+
+def submit_all(batcher, requests):
+    """Submit (query, num_neighbors) pairs concurrently, returning results or exceptions in order"""
+    def submit(request):
+        try:
+            return batcher.submit(*request)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=len(requests)) as executor:
+        return list(executor.map(submit, requests))
+
+
+def test_lone_query_is_sent_without_waiting_for_the_window():
+    batcher = QueryBatcher(lambda queries, k: [[q] for q in queries], max_wait_ms=2000)
+    start = time.monotonic()
+    assert batcher.submit("a", 5) == ["a"]
+    assert time.monotonic() - start < 1.0
+
+
+def test_results_fan_back_to_their_callers_grouped_by_num_neighbors():
+    calls = []
+    release = threading.Event()
+
+    def search(queries, num_neighbors):
+        calls.append((list(queries), num_neighbors))
+        release.wait(timeout=5)
+        return [(query, num_neighbors) for query in queries]
+
+    batcher = QueryBatcher(search, max_batch=16, max_wait_ms=50, max_concurrency=1)
+    # Occupy the only slot so the next queries queue up into one batch
+    blocker = threading.Thread(target=batcher.submit, args=("blocker", 1))
+    blocker.start()
+    time.sleep(0.1)
+
+    requests = [("a", 5), ("b", 10), ("c", 5), ("d", 10)]
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pending = executor.submit(submit_all, batcher, requests)
+        time.sleep(0.2)
+        release.set()
+        results = pending.result(timeout=5)
+    blocker.join(timeout=5)
+
+    assert results == [("a", 5), ("b", 10), ("c", 5), ("d", 10)]
+    grouped = sorted((sorted(queries), k) for queries, k in calls[1:])
+    assert grouped == [(["a", "c"], 5), (["b", "d"], 10)]
+
+
+def test_search_errors_propagate_to_every_query_in_the_group():
+    def search(queries, num_neighbors):
+        if num_neighbors == 10:
+            raise RuntimeError("index unavailable")
+        return [[query] for query in queries]
+
+    batcher = QueryBatcher(search, max_wait_ms=50)
+    results = submit_all(batcher, [("a", 10), ("b", 5), ("c", 10)])
+    assert isinstance(results[0], RuntimeError) and isinstance(results[2], RuntimeError)
+    assert results[1] == ["b"]
+
+
+def test_short_response_is_an_error():
+    batcher = QueryBatcher(lambda queries, k: [], max_wait_ms=10)
+    with pytest.raises(RuntimeError, match="Expected 1 neighbor lists"):
+        batcher.submit("a", 5)
+
+
+def test_search_calls_overlap():
+    in_flight = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def search(queries, num_neighbors):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.2)
+        with lock:
+            in_flight -= 1
+        return [[query] for query in queries]
+
+    # A batch size of 1 forces one call per query
+    batcher = QueryBatcher(search, max_batch=1, max_concurrency=4)
+    start = time.monotonic()
+    results = submit_all(batcher, [(str(i), 5) for i in range(4)])
+    assert results == [[str(i)] for i in range(4)]
+    assert peak > 1
+    assert time.monotonic() - start < 0.7
+
+
+def test_num_neighbors_groups_in_one_batch_run_concurrently():
+    release_blockers = threading.Event()
+    release_slow = threading.Event()
+
+    def search(queries, num_neighbors):
+        if num_neighbors == 1:
+            release_blockers.wait(timeout=5)
+        elif num_neighbors == 50:
+            release_slow.wait(timeout=5)
+        return [[query] for query in queries]
+
+    batcher = QueryBatcher(search, max_batch=16, max_wait_ms=50, max_concurrency=2)
+    # Occupy both slots so the next queries queue up into one batch
+    blockers = [threading.Thread(target=batcher.submit, args=(name, 1)) for name in ("x", "y")]
+    for blocker in blockers:
+        blocker.start()
+        time.sleep(0.1)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        slow = executor.submit(batcher.submit, "slow", 50)
+        fast = executor.submit(batcher.submit, "fast", 10)
+        time.sleep(0.1)
+        release_blockers.set()
+        # The k=10 call doesn't wait behind the k=50 call from the same batch
+        assert fast.result(timeout=2) == ["fast"]
+        assert not slow.done()
+        release_slow.set()
+        assert slow.result(timeout=5) == ["slow"]
+    for blocker in blockers:
+        blocker.join(timeout=5)
@@ -0,0 +1,60 @@
+import os
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+import vector_search
+from vector_search import VECTORIZED_SCORING_MIN_NEIGHBORS, VectorSearchService
+
+
+def make_service():
+    """VectorSearchService built by its real constructor, with the GCP clients mocked"""
+    env = {
+        "PROJECT_ID": "project",
+        "REGION": "us-central1",
+        "VECTOR_SEARCH_INDEX": "index",
+        "DEPLOYED_INDEX_ID": "projects/p/locations/l/indexEndpoints/e/deployedIndex/deployed",
+        # Query the index directly rather than through the batcher thread
+        "QUERY_BATCH_MAX_SIZE": "1",
+    }
+    with mock.patch.dict(os.environ, env, clear=True), \
+            mock.patch.object(vector_search, "vertexai"), \
+            mock.patch.object(vector_search, "aiplatform"), \
+            mock.patch.object(vector_search, "MultiModalEmbeddingModel"), \
+            mock.patch.object(vector_search.firestore, "Client"):
+        return VectorSearchService()
+
+
+def neighbors(distances):
+    return [SimpleNamespace(id=f"doc{i}", distance=d) for i, d in enumerate(distances)]
+
+
+@pytest.mark.parametrize("count", [10, VECTORIZED_SCORING_MIN_NEIGHBORS * 2])
+def test_filter_neighbors_keeps_index_order(count):
+    service = make_service()
+    # Distances deliberately unsorted, with every third neighbor over the threshold
+    distances = [(i % 7) / 10 + (1.0 if i % 3 == 0 else 0.0) for i in range(count)]
+
+    kept, scores = service._filter_neighbors(neighbors(distances), 0.9)
+
+    expected = [(f"doc{i}", d) for i, d in enumerate(distances) if d <= 0.9]
+    assert [n.id for n in kept] == [doc_id for doc_id, _ in expected]
+    assert scores == pytest.approx([d for _, d in expected])
+
+
+def test_search_similar_returns_results_in_index_order():
+    service = make_service()
+    distances = [0.3, 0.9, 0.5, 0.7]
+    service.index.find_neighbors.return_value = [neighbors(distances)]
+
+    with mock.patch.object(
+        service,
+        "_get_metadata_from_firestore",
+        side_effect=lambda doc_ids: {doc_id: {"file_name": doc_id} for doc_id in doc_ids}
+    ):
+        results = service.search_similar([0.0] * 1408, num_neighbors=4, distance_threshold=1.0)
+
+    assert [r.id for r in results] == ["doc0", "doc1", "doc2", "doc3"]
+    assert [r.score for r in results] == distances
+    assert [r.metadata["file_name"] for r in results] == ["doc0", "doc1", "doc2", "doc3"]
@@ -16,18 +16,45 @@ limitations under the License.
 from google.cloud import aiplatform
 from google.cloud import storage
 from google.cloud import firestore
+import google.auth
+import google.auth.credentials
+import google.auth.transport.requests
 import vertexai
 from vertexai.vision_models import MultiModalEmbeddingModel
 import numpy as np
 import os
-from typing import List
+import time
+import functools
+import threading
+from datetime import timedelta
+from cachetools import LRUCache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 import logging
 import json
 from models import SearchResult
+from metadata_cache import MetadataCache
+from query_batcher import QueryBatcher
 from math import sqrt
 
 logger = logging.getLogger(__name__)
 
+# Metadata lookups larger than this are split into concurrent get_all calls
+METADATA_FETCH_CHUNK_SIZE = 20
+METADATA_FETCH_WORKERS = 8
+
+# Number of distinct query strings whose embeddings are memoized
+EMBEDDING_CACHE_SIZE = 4096
+
+# Neighbor counts above this filter and score distances with NumPy
+VECTORIZED_SCORING_MIN_NEIGHBORS = 100
+
+# Signed image URLs are valid for an hour and re-signed every 30 minutes, so
+# a URL handed out from the cache always has at least 30 minutes left
+SIGNED_URL_EXPIRATION_SECONDS = 3600
+SIGNED_URL_ROTATION_SECONDS = 1800
+SIGNED_URL_CACHE_SIZE = 8192
+
 class VectorSearchService:
     def __init__(self):
         """Initialize Vector Search service"""
@@ -53,42 +80,244 @@ class VectorSearchService:
         self.index = aiplatform.MatchingEngineIndexEndpoint(
             index_endpoint_name=self.deployed_index_id.split("/deployedIndex")[0]
         )
+
+        # Short deployed index ID for find_neighbors, resolved once; the full
+        # resource name ends in .../deployedIndex/<short id>
+        self._deployed_index_id = (
+            os.environ.get('DEPLOYED_INDEX_SHORT_ID')
+            or self.deployed_index_id.rsplit("/", 1)[-1]
+        )
         
         # Initialize multimodal embedding model
         self.embedding_model = MultiModalEmbeddingModel.from_pretrained("multimodalembedding")
         
-        # Initialize storage client
-        self.storage_client = storage.Client()
-        self.bucket = self.storage_client.bucket(self.bucket_name)
-
         # Initialize Firestore client
         self.db = firestore.Client()
+        self.metadata_col = self.db.collection('index_metadata')
+
+        # Cache metadata lookups in-process, and in Redis when configured
+        self.metadata_cache = MetadataCache(
+            maxsize=int(os.environ.get('METADATA_CACHE_SIZE', 50000)),
+            redis_url=os.environ.get('REDIS_URL'),
+            ttl=int(os.environ.get('METADATA_CACHE_TTL', 86400))
+        )
+
+        # Shared pool for overlapping independent Firestore reads
+        self._fetch_pool = ThreadPoolExecutor(
+            max_workers=METADATA_FETCH_WORKERS,
+            thread_name_prefix="firestore-fetch"
+        )
+
+        # Optionally attach signed URLs for gs:// images; skip when the
+        # bucket is public or clients sign URLs themselves. On Cloud Run the
+        # service account signs through IAM signBlob, which needs
+        # roles/iam.serviceAccountTokenCreator on itself
+        self.sign_image_urls = os.environ.get('SIGN_IMAGE_URLS', '').lower() in ('1', 'true', 'yes')
+        self._signed_url = functools.lru_cache(maxsize=SIGNED_URL_CACHE_SIZE)(
+            self._generate_signed_url
+        )
+        self._signing_lock = threading.Lock()
+
+        # Coalesce concurrent searches into batched find_neighbors calls;
+        # a max batch size of 1 sends every query on its own
+        max_batch = int(os.environ.get('QUERY_BATCH_MAX_SIZE', 16))
+        self._batcher = QueryBatcher(
+            self._find_neighbors,
+            max_batch=max_batch,
+            max_wait_ms=float(os.environ.get('QUERY_BATCH_MAX_WAIT_MS', 5)),
+            max_concurrency=int(os.environ.get('QUERY_BATCH_MAX_CONCURRENCY', 8))
+        ) if max_batch > 1 else None
+
+        # Memoized query embeddings, keyed by whitespace-normalized text
+        self._embedding_cache = LRUCache(maxsize=EMBEDDING_CACHE_SIZE)
+        self._embedding_cache_lock = threading.Lock()
+
+    @functools.cached_property
+    def storage_client(self) -> storage.Client:
+        """Storage client, created on first use; only URL signing needs it"""
+        return storage.Client()
+
+    @functools.cached_property
+    def signing_credentials(self) -> google.auth.credentials.Credentials:
+        """Default credentials, used to sign image URLs"""
+        credentials, _ = google.auth.default(
+            scopes=['https://www.googleapis.com/auth/cloud-platform']
+        )
+        return credentials
 
     def generate_text_embedding(self, text: str) -> np.ndarray:
-        """Generate embedding for text query using multimodal model"""
+        """
+        Generate embedding for text query using multimodal model
+
+        Results are memoized per query. Surrounding and repeated whitespace is
+        ignored, but case is preserved since the model is case-sensitive. The
+        returned array is shared between callers and is read-only.
+        """
+        key = " ".join(text.split())
+        with self._embedding_cache_lock:
+            embedding = self._embedding_cache.get(key)
+        if embedding is not None:
+            logger.debug(f"Embedding cache hit for query: {key!r}")
+            return embedding
+
+        logger.debug(f"Embedding cache miss for query: {key!r}")
+        embedding = self._embed_text(key)
+        embedding.setflags(write=False)
+        with self._embedding_cache_lock:
+            self._embedding_cache[key] = embedding
+        return embedding
+
+    def _embed_text(self, text: str) -> np.ndarray:
+        """Call the multimodal model for a text embedding and L2-normalize it"""
         embeddings = self.embedding_model.get_embeddings(
             image=None,  # No image for text-only query
             contextual_text=text,
             dimension=1408
         )
         
-        # Get text embedding from model response
-        embedding_array = np.array(embeddings.text_embedding)
-        return embedding_array / np.linalg.norm(embedding_array)
+        # Get text embedding from model response as float32, the precision the
+        # index stores, and L2-normalize it in place without a temporary
+        embedding_array = np.asarray(embeddings.text_embedding, dtype=np.float32)
+        embedding_array *= np.float32(1.0) / np.sqrt(np.dot(embedding_array, embedding_array))
+        return embedding_array
 
-    async def _get_metadata_from_firestore(self, doc_id: str) -> dict:
-        """Get metadata from Firestore for a given document ID"""
-        try:
-            doc_ref = self.db.collection('index_metadata').document(doc_id)
-            doc = doc_ref.get()
+    def _get_metadata(self, doc_ids: List[str]) -> Dict[str, dict]:
+        """
+        Get metadata for a set of document IDs, keyed by ID. This is the only
+        metadata lookup path: it serves from cache and batches every miss into
+        get_all calls, so callers can't fall into per-document reads.
+        """
+        metadata_by_id = self.metadata_cache.get_many(doc_ids)
+        missing_ids = list(dict.fromkeys(
+            doc_id for doc_id in doc_ids if doc_id not in metadata_by_id
+        ))
+
+        fetched = self._get_metadata_from_firestore(missing_ids)
+        self.metadata_cache.set_many(fetched)
+        metadata_by_id.update(fetched)
+
+        if self.sign_image_urls and metadata_by_id:
+            # Each signature not yet cached is a signBlob round-trip, so sign
+            # concurrently; cached ones return straight from the LRU
+            metadata_by_id = dict(zip(
+                metadata_by_id,
+                self._fetch_pool.map(self._attach_signed_url, metadata_by_id.values())
+            ))
+        return metadata_by_id
+
+    def _get_metadata_from_firestore(self, doc_ids: List[str]) -> Dict[str, dict]:
+        """
+        Get metadata from Firestore for the given document IDs. Missing
+        documents are omitted.
+
+        Each chunk of IDs is read with one batched get_all round-trip, and
+        chunks are fetched concurrently so latency tracks the slowest chunk
+        rather than the sum of all of them.
+        """
+        if not doc_ids:
+            return {}
+
+        chunks = [
+            doc_ids[i:i + METADATA_FETCH_CHUNK_SIZE]
+            for i in range(0, len(doc_ids), METADATA_FETCH_CHUNK_SIZE)
+        ]
+        if len(chunks) == 1:
+            return self._get_metadata_chunk(chunks[0])
+
+        metadata_by_id = {}
+        for chunk_metadata in self._fetch_pool.map(self._get_metadata_chunk, chunks):
+            metadata_by_id.update(chunk_metadata)
+        return metadata_by_id
+
+    def _get_metadata_chunk(self, doc_ids: List[str]) -> Dict[str, dict]:
+        """Read one chunk of metadata documents with a single get_all call"""
+        doc_refs = [self.metadata_col.document(doc_id) for doc_id in doc_ids]
+
+        metadata_by_id = {}
+        for doc in self.db.get_all(doc_refs):
             if doc.exists:
-                return doc.to_dict()
+                metadata_by_id[doc.id] = doc.to_dict()
             else:
-                logger.warning(f"No metadata found in Firestore for document ID: {doc_id}")
-                return {}
+                logger.warning(f"No metadata found in Firestore for document ID: {doc.id}")
+        return metadata_by_id
+
+    def _generate_signed_url(self, gcs_path: str, expiry_bucket: int) -> Optional[str]:
+        """
+        Sign a V4 GET URL for a gs:// path. expiry_bucket only partitions the
+        cache so URLs are re-signed once per rotation window. Returns None if
+        signing fails, which is cached too, so a failing path is retried (and
+        logged) once per window rather than on every request.
+        """
+        bucket_name, _, blob_name = gcs_path[len("gs://"):].partition("/")
+        try:
+            blob = self.storage_client.bucket(bucket_name).blob(blob_name)
+            signing_kwargs = {}
+            credentials = self.signing_credentials
+            if not isinstance(credentials, google.auth.credentials.Signing):
+                # Metadata-server credentials (Cloud Run) hold no private key,
+                # so sign through the IAM signBlob API with the service account
+                with self._signing_lock:
+                    if not credentials.valid:
+                        credentials.refresh(google.auth.transport.requests.Request())
+                    signing_kwargs = {
+                        'service_account_email': credentials.service_account_email,
+                        'access_token': credentials.token
+                    }
+            return blob.generate_signed_url(
+                version="v4",
+                expiration=timedelta(seconds=SIGNED_URL_EXPIRATION_SECONDS),
+                method="GET",
+                **signing_kwargs
+            )
         except Exception as e:
-            logger.error(f"Error fetching metadata from Firestore for {doc_id}: {e}")
-            return {}
+            logger.warning(f"Could not sign URL for {gcs_path}: {e}")
+            return None
+
+    def _attach_signed_url(self, metadata: dict) -> dict:
+        """Return a copy of metadata with a cached signed URL for its image"""
+        gcs_path = metadata.get('processed_image_path', '')
+        if not gcs_path.startswith('gs://'):
+            return metadata
+        try:
+            expiry_bucket = int(time.time() // SIGNED_URL_ROTATION_SECONDS)
+            signed_url = self._signed_url(gcs_path, expiry_bucket)
+        except Exception as e:
+            logger.warning(f"Could not sign URL for {gcs_path}: {e}")
+            return metadata
+        # No unsigned fallback: private images stay gs:// and the client signs
+        # them itself; public buckets run with SIGN_IMAGE_URLS off
+        if signed_url is None:
+            return metadata
+        # Metadata dicts are shared with the cache, so never mutate them
+        return {**metadata, 'signed_image_url': signed_url}
+
+    def _find_neighbors(self, queries: List[List[float]], num_neighbors: int):
+        """Query the index endpoint, returning one neighbor list per query"""
+        return self.index.find_neighbors(
+            deployed_index_id=self._deployed_index_id,
+            queries=queries,
+            num_neighbors=num_neighbors
+        )
+
+    def _filter_neighbors(self, neighbors, distance_threshold: float):
+        """
+        Drop neighbors beyond the distance threshold and return the kept
+        neighbors with their scores. Large result sets are filtered in a single
+        NumPy pass instead of per-neighbor Python comparisons.
+        """
+        if len(neighbors) <= VECTORIZED_SCORING_MIN_NEIGHBORS:
+            kept = [n for n in neighbors if n.distance <= distance_threshold]
+            return kept, [n.distance for n in kept]
+
+        distances = np.fromiter(
+            (n.distance for n in neighbors), dtype=np.float64, count=len(neighbors)
+        )
+        # flatnonzero already runs the filter as one compiled loop, so there is
+        # nothing left for a JIT to speed up here
+        keep = np.flatnonzero(distances <= distance_threshold)
+        if keep.size == len(neighbors):
+            return list(neighbors), distances.tolist()
+        return [neighbors[i] for i in keep], distances[keep].tolist()
 
     def search_similar(
             self,
@@ -104,44 +333,39 @@ class VectorSearchService:
              The value you want will be from -1(opposite vectors) to 1 (identical vectors).
             """
             try:
-                # Convert embedding to list if it's numpy array
+                # Convert embedding to list if it's numpy array; float32 matches the
+                # index precision and is a no-op for generate_text_embedding output
                 if isinstance(query_embedding, np.ndarray):
-                    query_embedding = query_embedding.tolist()
+                    query_embedding = query_embedding.astype(np.float32, copy=False).tolist()
 
                 # Query the index endpoint
-                response = self.index.find_neighbors(
-                    deployed_index_id="deployed_image_search_index",
-                    queries=[query_embedding],
-                    num_neighbors=num_neighbors
-                )
-
-                results = []
-
-                for neighbor in response[0]:
-                     
-                    distance_score = neighbor.distance
-
-                    if distance_score >distance_threshold:
-                        continue
-
-                    # Get metadata from Firestore using the neighbor.id
-                    doc_ref = self.db.collection('index_metadata').document(neighbor.id)
-                    doc = doc_ref.get()
-                    
-                    if doc.exists:
-                        metadata = doc.to_dict()
-                    else:
-                        logger.warning(f"No metadata found in Firestore for document ID: {neighbor.id}")
-                        metadata = {}
-
-                    results.append(SearchResult(
+                if self._batcher is not None:
+                    query_neighbors = self._batcher.submit(query_embedding, num_neighbors)
+                else:
+                    query_neighbors = self._find_neighbors([query_embedding], num_neighbors)[0]
+
+                neighbors, scores = self._filter_neighbors(query_neighbors, distance_threshold)
+
+                metadata_by_id = self._get_metadata([n.id for n in neighbors])
+
+                results = [
+                    SearchResult(
                         id=neighbor.id,
-                        score=distance_score,
-                        metadata=metadata
-                    ))
+                        score=score,
+                        metadata=metadata_by_id.get(neighbor.id, {})
+                    ) for neighbor, score in zip(neighbors, scores)
+                ]
 
                 return results
 
             except Exception as e:
                 logger.error(f"Error searching similar vectors: {e}", exc_info=True)
-                raise
\ No newline at end of file
+                raise
+
+@functools.lru_cache(maxsize=1)
+def get_service() -> VectorSearchService:
+    """
+    Return the process-wide VectorSearchService, so the index endpoint,
+    embedding model and client channels are created once and reused
+    """
+    return VectorSearchService()
@@ -1,17 +1,29 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import requests
-from typing import List, Dict
+from requests.adapters import HTTPAdapter
+import orjson
+import numpy as np
+import diskcache
+from typing import Callable, List, Dict, Optional, Tuple
 import os
+import re
+import math
+import hashlib
+import threading
+import time
+import heapq
+import logging
 from dotenv import load_dotenv
 from io import BytesIO
-import asyncio
-import aiohttp
+from PIL import Image
 from concurrent.futures import ThreadPoolExecutor
-from functools import lru_cache
 from google.cloud import storage
 from datetime import timedelta
+from urllib.parse import urlparse
 import google.auth
-from google.auth import compute_engine, impersonated_credentials
+import google.auth.transport.requests
+from google.auth import compute_engine
 from google.oauth2 import service_account
 from google.oauth2.credentials import Credentials as OAuth2Credentials
 
@@ -26,7 +38,7 @@ st.set_page_config(
 )
 
 # Custom CSS for Material Design styling
-st.markdown("""
+CSS = """
     <style>
     /* Material Design Colors and Variables */
     :root {
@@ -176,135 +188,314 @@ st.markdown("""
         height: 100%;
     }
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+# Strip comments and indentation once at import; the stylesheet is re-sent on
+# every rerun, since Streamlit drops elements a run doesn't emit again
+_MINIFIED_CSS = re.sub(r'\s+', ' ', re.sub(r'/\*.*?\*/', '', CSS, flags=re.S)).strip()
+st.markdown(_MINIFIED_CSS, unsafe_allow_html=True)
+
+logger = logging.getLogger(__name__)
 
 # Constants
 API_ENDPOINT = os.getenv('API_ENDPOINT')
 if not API_ENDPOINT:
     raise ValueError("API_ENDPOINT environment variable is not set")
 
-# Initialize storage client at app startup
-storage_client = storage.Client()
+# "api" queries the search service over HTTP; "direct" calls VectorSearchService
+# in-process. "direct" is for local development only: it needs src/search_api on
+# PYTHONPATH with its requirements installed, none of which ship in the UI image
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'api')
+
+# Show raw API responses in a Logging tab; off by default so the UI doesn't
+# render the full response on every search
+SEARCH_DEBUG = bool(os.getenv('SEARCH_DEBUG'))
+
+# Number of result cards rendered per page of the grid
+RESULTS_PER_PAGE = 15
+
+# Distinct searches whose responses each session keeps, oldest evicted first;
+# entries expire after the same 300s as the process-wide search caches
+SESSION_SEARCH_CACHE_SIZE = 20
+SESSION_SEARCH_TTL = 300
+
+# Signed URLs are cached with the time they were signed and reused until they
+# have less than this many seconds left, whichever cache tier they come from
+SIGNED_URL_MIN_REMAINING = 600
+
+# Optional directory for a signed-URL cache that survives container restarts.
+# Off by default: Cloud Run's /tmp is in-memory, so point this at a mounted
+# volume, never at a local path there
+SIGNED_URL_CACHE_DIR = os.getenv('SIGNED_URL_CACHE_DIR')
+
+# Grid images are downscaled to fit this box before being sent to the browser
+THUMBNAIL_SIZE = (400, 400)
+
+# Concurrent signing calls per page; Compute Engine signing is an IAM RPC
+SIGNING_WORKERS = 16
+
+@st.cache_resource
+def get_credentials():
+    """Application default credentials and project, discovered once per process"""
+    return google.auth.default()
+
+@st.cache_resource
+def get_storage_client() -> storage.Client:
+    """Storage client bound to the default credentials, shared across reruns"""
+    credentials, project = get_credentials()
+    return storage.Client(credentials=credentials, project=project)
+
+@st.cache_resource
+def get_signing_credentials() -> service_account.Credentials:
+    """Service account key used to sign URLs when running with impersonated credentials"""
+    return service_account.Credentials.from_service_account_file(
+        'key.json',  # Your service account key file
+        scopes=['https://www.googleapis.com/auth/cloud-platform']
+    )
+
+@st.cache_resource
+def get_signing_storage_client() -> storage.Client:
+    """Storage client bound to the signing service account"""
+    return storage.Client(credentials=get_signing_credentials())
+
+@st.cache_resource
+def get_signed_url_store() -> Optional[diskcache.Cache]:
+    """On-disk store of signed URLs that survives process restarts, if configured"""
+    if not SIGNED_URL_CACHE_DIR:
+        return None
+    return diskcache.Cache(SIGNED_URL_CACHE_DIR, size_limit=500_000_000)
+
+def _reuse_seconds_left(signed_at: float, expiration: int) -> float:
+    """How much longer a URL signed at signed_at may be handed out"""
+    return signed_at + expiration - SIGNED_URL_MIN_REMAINING - time.time()
 
 def get_signed_url(bucket_name: str, blob_name: str, expiration: int = 3600) -> str:
     """Generate signed URL for accessing private bucket objects"""
+    url, signed_at = _signed_url_cached(bucket_name, blob_name, expiration)
+    if _reuse_seconds_left(signed_at, expiration) <= 0:
+        # Too close to expiry to hand out; drop just this entry and re-sign
+        _signed_url_cached.clear(bucket_name, blob_name, expiration)
+        url, signed_at = _signed_url_cached(bucket_name, blob_name, expiration)
+    return url
+
+@st.cache_data(max_entries=2048, show_spinner=False)
+def _signed_url_cached(bucket_name: str, blob_name: str, expiration: int) -> Tuple[str, float]:
+    """
+    Sign a URL for a bucket object, returning it with the time it was signed;
+    memoized so reruns don't re-sign the same tiles
+    """
+    store = get_signed_url_store()
+    key = (bucket_name, blob_name, expiration)
+    if store is not None:
+        cached = store.get(key)
+        if cached is not None and _reuse_seconds_left(cached[1], expiration) > 0:
+            return cached
+
+    signed_at = time.time()
+    url = _sign_url(bucket_name, blob_name, expiration)
+    # Only persist real signatures, not the unsigned fallbacks
+    if store is not None and 'X-Goog-Signature=' in url:
+        store.set(key, (url, signed_at), expire=_reuse_seconds_left(signed_at, expiration))
+    return url, signed_at
+
+def _public_url(bucket_name: str, blob_name: str) -> str:
+    """Unsigned URL for a bucket object"""
+    return f"https://storage.googleapis.com/{bucket_name}/{blob_name}"
+
+def _sign_oauth(credentials, bucket_name: str, blob_name: str, expiration: int) -> str:
+    """OAuth credentials (local development with gcloud auth) can't sign, so pass the token"""
+    url = _public_url(bucket_name, blob_name)
+    if credentials.token:
+        url = f"{url}?access_token={credentials.token}"
+    return url
+
+# The default credentials are shared by every signing thread in the process
+_credentials_refresh_lock = threading.Lock()
+
+def refresh_credentials(credentials) -> None:
+    """Refresh shared credentials if they have expired, one thread at a time"""
+    if credentials.valid:
+        return
+    with _credentials_refresh_lock:
+        if not credentials.valid:
+            credentials.refresh(google.auth.transport.requests.Request())
+
+def _sign_compute_engine(credentials, bucket_name: str, blob_name: str, expiration: int) -> str:
+    """Compute Engine credentials (Cloud Run)"""
+    try:
+        # Metadata-server credentials hold no private key, so sign through
+        # the IAM signBlob API with the instance's service account
+        refresh_credentials(credentials)
+        blob = get_storage_client().bucket(bucket_name).blob(blob_name)
+        return blob.generate_signed_url(
+            version="v4",
+            expiration=timedelta(seconds=expiration),
+            method="GET",
+            service_account_email=credentials.service_account_email,
+            access_token=credentials.token
+        )
+    except Exception as e:
+        logger.warning(f"Falling back to token auth: {str(e)}")
+        # Fall back to token auth if signing fails
+        credentials = compute_engine.IDTokenCredentials(
+            credentials, "https://storage.googleapis.com"
+        )
+        url = _public_url(bucket_name, blob_name)
+        if credentials.token:
+            url = f"{url}?access_token={credentials.token}"
+        return url
+
+def _sign_service_account(credentials, bucket_name: str, blob_name: str, expiration: int) -> str:
+    """Service account credentials, which sign locally with their private key"""
+    blob = get_storage_client().bucket(bucket_name).blob(blob_name)
     try:
-        credentials, project = google.auth.default()
-        storage_client = storage.Client(credentials=credentials)
+        return blob.generate_signed_url(
+            version="v4",
+            expiration=timedelta(seconds=expiration),
+            method="GET"
+        )
+    except Exception as e:
+        logger.warning(f"Signed URL generation failed, using direct access: {str(e)}")
+        return _public_url(bucket_name, blob_name)
+
+def _sign_impersonated(credentials, bucket_name: str, blob_name: str, expiration: int) -> str:
+    """Impersonated credentials, signed with the source service account key"""
+    try:
+        # Use the source credentials, which can sign
+        source_credentials = get_signing_credentials()
+        blob = get_signing_storage_client().bucket(bucket_name).blob(blob_name)
         
-        # If using OAuth credentials (local development with gcloud auth)
-        if isinstance(credentials, OAuth2Credentials):
-            url = f"https://storage.googleapis.com/{bucket_name}/{blob_name}"
-            if credentials.token:
-                url = f"{url}?access_token={credentials.token}"
-            return url
-            
-        # If using Compute Engine credentials (Cloud Run)
-        elif isinstance(credentials, compute_engine.Credentials):
-            try:
-                # First try to generate a signed URL
-                bucket = storage_client.bucket(bucket_name)
-                blob = bucket.blob(blob_name)
-                return blob.generate_signed_url(
-                    version="v4",
-                    expiration=timedelta(seconds=expiration),
-                    method="GET"
-                )
-            except Exception as e:
-                st.write(f"Falling back to token auth: {str(e)}")
-                # Fall back to token auth if signing fails
-                credentials = compute_engine.IDTokenCredentials(
-                    credentials, "https://storage.googleapis.com"
-                )
-                url = f"https://storage.googleapis.com/{bucket_name}/{blob_name}"
-                if credentials.token:
-                    url = f"{url}?access_token={credentials.token}"
-                return url
-            
-        # If using service account credentials
-        elif isinstance(credentials, service_account.Credentials):
-            bucket = storage_client.bucket(bucket_name)
-            blob = bucket.blob(blob_name)
-            try:
-                return blob.generate_signed_url(
-                    version="v4",
-                    expiration=timedelta(seconds=expiration),
-                    method="GET"
-                )
-            except Exception as e:
-                st.write(f"Signed URL generation failed, using direct access: {str(e)}")
-                return f"https://storage.googleapis.com/{bucket_name}/{blob_name}"
-                
-        # If using impersonated credentials
-        elif isinstance(credentials, impersonated_credentials.Credentials):
-            try:
-                # Create a source credentials object that can sign
-                source_credentials = service_account.Credentials.from_service_account_file(
-                    'key.json',  # Your service account key file
-                    scopes=['https://www.googleapis.com/auth/cloud-platform']
-                )
-                
-                # Create the storage client with the source credentials
-                storage_client = storage.Client(credentials=source_credentials)
-                bucket = storage_client.bucket(bucket_name)
-                blob = bucket.blob(blob_name)
-                
-                # Generate signed URL with the source credentials
-                return blob.generate_signed_url(
-                    version="v4",
-                    expiration=timedelta(seconds=expiration),
-                    method="GET",
-                    service_account_email=source_credentials.service_account_email
-                )
-            except Exception as e:
-                st.error(f"Signed URL generation failed with impersonated credentials: {str(e)}")
-                try:
-                    # Try to use the credentials token directly
-                    headers = {}
-                    auth_req = google.auth.transport.requests.Request()
-                    credentials.refresh(auth_req)
-                    credentials.apply(headers)
-                    
-                    if 'authorization' in headers:
-                        token = headers['authorization'].split(' ')[1]
-                        url = f"https://storage.googleapis.com/{bucket_name}/{blob_name}?access_token={token}"
-                        return url
-                except Exception as token_error:
-                    st.error(f"Token-based access also failed: {str(token_error)}")
-                    return f"https://storage.googleapis.com/{bucket_name}/{blob_name}"
-            
-        else:
-            st.error(f"Unsupported credentials type: {type(credentials)}")
-            return f"https://storage.googleapis.com/{bucket_name}/{blob_name}"
+        # Generate signed URL with the source credentials
+        return blob.generate_signed_url(
+            version="v4",
+            expiration=timedelta(seconds=expiration),
+            method="GET",
+            service_account_email=source_credentials.service_account_email
+        )
+    except Exception as e:
+        st.error(f"Signed URL generation failed with impersonated credentials: {str(e)}")
+        try:
+            # Try to use the credentials token directly
+            headers = {}
+            auth_req = google.auth.transport.requests.Request()
+            credentials.refresh(auth_req)
+            credentials.apply(headers)
             
+            if 'authorization' in headers:
+                token = headers['authorization'].split(' ')[1]
+                return f"{_public_url(bucket_name, blob_name)}?access_token={token}"
+        except Exception as token_error:
+            st.error(f"Token-based access also failed: {str(token_error)}")
+        return _public_url(bucket_name, blob_name)
+
+def _sign_unsupported(credentials, bucket_name: str, blob_name: str, expiration: int) -> str:
+    """Any other credentials type gets the unsigned URL"""
+    st.error(f"Unsupported credentials type: {type(credentials)}")
+    return _public_url(bucket_name, blob_name)
+
+@st.cache_resource
+def get_url_signers() -> Dict[type, Callable]:
+    """Credentials type to URL signer, built once per process"""
+    # Imported here rather than at module level; it's only needed once signing
+    from google.auth import impersonated_credentials
+    return {
+        OAuth2Credentials: _sign_oauth,
+        compute_engine.Credentials: _sign_compute_engine,
+        service_account.Credentials: _sign_service_account,
+        impersonated_credentials.Credentials: _sign_impersonated
+    }
+
+def _sign_url(bucket_name: str, blob_name: str, expiration: int) -> str:
+    """Sign a URL for a bucket object, falling back to direct or token access"""
+    try:
+        credentials, project = get_credentials()
+        signers = get_url_signers()
+        # Walk the MRO so subclasses of a supported credentials type still match
+        signer = next(
+            (signers[cls] for cls in type(credentials).__mro__ if cls in signers),
+            _sign_unsupported
+        )
+        return signer(credentials, bucket_name, blob_name, expiration)
     except Exception as e:
         st.error(f"Error generating URL: {str(e)}")
-        return f"https://storage.googleapis.com/{bucket_name}/{blob_name}"
+        return _public_url(bucket_name, blob_name)
 
-def search_images(query: str, use_mock: bool = False):
+@st.cache_resource
+def get_http_session() -> requests.Session:
     """
-    Search for images using either the real API or mock data.
-    Returns the full response object when using the real API,
-    or a mock response object when using mock data.
+    Shared HTTP session so API calls and image downloads reuse keep-alive
+    connections across reruns instead of paying a TLS handshake each time
+    """
+    session = requests.Session()
+    # Sized for a full page of concurrent image downloads
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def _search_summary(body: Dict, status_code: int = 200, headers: Dict = None, text: str = '') -> Dict:
+    """Serializable summary of a search response, consumed by main()"""
+    return {
+        'ok': 200 <= status_code < 400,
+        'status_code': status_code,
+        'headers': headers or {'content-type': 'application/json'},
+        'body': body,
+        'text': text
+    }
+
+@st.cache_resource
+def get_vector_service():
+    """Process-wide VectorSearchService, kept across reruns and sessions"""
+    from vector_search import get_service
+    return get_service()
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _search_api(query: str) -> Dict:
+    """
+    POST a query to the search API and return the decoded response.
+    Raises on HTTP and decoding errors so failures aren't cached.
+    """
+    response = get_http_session().post(
+        f"{API_ENDPOINT}/search",
+        json={"query": query},
+        timeout=30
+    )
+    response.raise_for_status()
+    return _search_summary(
+        orjson.loads(response.content),
+        status_code=response.status_code,
+        headers=dict(response.headers)
+    )
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _search_direct(query: str) -> Dict:
+    """Run a query against the in-process VectorSearchService"""
+    service = get_vector_service()
+    embedding = service.generate_text_embedding(query)
+    results = service.search_similar(
+        query_embedding=embedding,
+        num_neighbors=50,
+        distance_threshold=0.5
+    )
+    return _search_summary({
+        'query': query,
+        'results': [
+            {
+                'id': r.id,
+                'similarity_score': r.score,
+                'metadata': r.metadata
+            } for r in results
+        ]
+    })
+
+def search_images(query: str, use_mock: bool = False) -> Dict:
+    """
+    Search for images using the real API, the in-process service or mock data.
+    Returns a serializable summary with ok, status_code, headers, body and text.
     """
     if use_mock:
+        # Ordered by similarity, matching the real API
         mock_results = [
-            {
-                "id": "city-building.jpg",
-                "metadata": {
-                    "characteristics": "Modern, urban, architectural, glass, steel, blue sky, reflective, downtown",
-                    "content_type": "image/jpeg",
-                    "context": "A modern glass skyscraper in a downtown area, reflecting the blue sky and surrounding buildings. The architecture showcases contemporary urban design.",
-                    "created_at": "Fri, 10 Jan 2025 12:35:36 GMT",
-                    "file_name": "city-building.jpg",
-                    "location": "New York",
-                    "objects": "Building, windows, sky, reflections, architectural details, glass panels",
-                    "original_bucket": "image-search-demo",
-                    "processed_image_path": "https://images.unsplash.com/photo-1486325212027-8081e485255e?w=800&auto=format&fit=crop",
-                    "size": "3.2 MB"
-                },
-                "similarity_score": 0.9415058791637421
-            },
             {
                 "id": "nature-landscape.jpg",
                 "metadata": {
@@ -322,20 +513,20 @@ def search_images(query: str, use_mock: bool = False):
                 "similarity_score": 0.9819442108273506
             },
             {
-                "id": "coffee-workspace.jpg",
+                "id": "city-building.jpg",
                 "metadata": {
-                    "characteristics": "Indoor, warm, cozy, productive, modern, minimal, organized, professional",
+                    "characteristics": "Modern, urban, architectural, glass, steel, blue sky, reflective, downtown",
                     "content_type": "image/jpeg",
-                    "context": "A clean and modern workspace setup with a laptop, coffee cup, and minimal accessories on a wooden desk. The scene suggests a productive work environment.",
-                    "created_at": "Fri, 10 Jan 2025 12:34:45 GMT",
-                    "file_name": "coffee-workspace.jpg",
-                    "location": "Home Office",
-                    "objects": "Laptop, coffee cup, desk, notebook, pen, plant, wooden surface",
+                    "context": "A modern glass skyscraper in a downtown area, reflecting the blue sky and surrounding buildings. The architecture showcases contemporary urban design.",
+                    "created_at": "Fri, 10 Jan 2025 12:35:36 GMT",
+                    "file_name": "city-building.jpg",
+                    "location": "New York",
+                    "objects": "Building, windows, sky, reflections, architectural details, glass panels",
                     "original_bucket": "image-search-demo",
-                    "processed_image_path": "https://images.unsplash.com/photo-1486312338219-ce68d2c6f44d?w=800&auto=format&fit=crop",
-                    "size": "1.9 MB"
+                    "processed_image_path": "https://images.unsplash.com/photo-1486325212027-8081e485255e?w=800&auto=format&fit=crop",
+                    "size": "3.2 MB"
                 },
-                "similarity_score": 0.8756324159276485
+                "similarity_score": 0.9415058791637421
             },
             {
                 "id": "beach-sunset.jpg",
@@ -368,65 +559,72 @@ def search_images(query: str, use_mock: bool = False):
                     "size": "1.7 MB"
                 },
                 "similarity_score": 0.8912345678901234
+            },
+            {
+                "id": "coffee-workspace.jpg",
+                "metadata": {
+                    "characteristics": "Indoor, warm, cozy, productive, modern, minimal, organized, professional",
+                    "content_type": "image/jpeg",
+                    "context": "A clean and modern workspace setup with a laptop, coffee cup, and minimal accessories on a wooden desk. The scene suggests a productive work environment.",
+                    "created_at": "Fri, 10 Jan 2025 12:34:45 GMT",
+                    "file_name": "coffee-workspace.jpg",
+                    "location": "Home Office",
+                    "objects": "Laptop, coffee cup, desk, notebook, pen, plant, wooden surface",
+                    "original_bucket": "image-search-demo",
+                    "processed_image_path": "https://images.unsplash.com/photo-1486312338219-ce68d2c6f44d?w=800&auto=format&fit=crop",
+                    "size": "1.9 MB"
+                },
+                "similarity_score": 0.8756324159276485
             }
         ]
         
-        # Create a mock response object
-        class MockResponse:
-            def __init__(self, data):
-                self.data = data
-                self.status_code = 200
-                self.ok = True
-                self._headers = {
-                    'content-type': 'application/json',
-                    'date': 'Fri, 10 Jan 2025 13:54:00 GMT',
-                    'server': 'Mock Server'
-                }
-            
-            def json(self):
-                return self.data
-            
-            @property
-            def headers(self):
-                return self._headers
-            
-            @property
-            def text(self):
-                return str(self.data)
-        
-        return MockResponse({'query': query, 'results': mock_results})
+        return _search_summary({'query': query, 'results': mock_results})
+    
+    if SEARCH_BACKEND == 'direct':
+        try:
+            return _search_direct(query)
+        except ImportError as e:
+            logger.error(f"Direct search backend unavailable: {e}")
+            return _search_summary(
+                None,
+                status_code=500,
+                headers={},
+                text=f"SEARCH_BACKEND=direct needs src/search_api and its requirements installed: {e}"
+            )
+        except Exception as e:
+            logger.error(f"Direct search failed: {e}")
+            return _search_summary(None, status_code=500, headers={}, text=str(e))
     
     try:
-        headers = {
-            'Content-Type': 'application/json'
-        }
-        response = requests.post(
-            f"{API_ENDPOINT}/search",
-            headers=headers,
-            json={"query": query}
+        return _search_api(query)
+    except requests.HTTPError as e:
+        return _search_summary(
+            None,
+            status_code=e.response.status_code,
+            headers=dict(e.response.headers),
+            text=e.response.text
         )
-        return response
-    except requests.RequestException as e:
-        # Create an error response
-        class ErrorResponse:
-            def __init__(self, error):
-                self.status_code = 500
-                self.ok = False
-                self.error = error
-                self._headers = {}
-            
-            def json(self):
-                return {'error': str(self.error)}
-            
-            @property
-            def headers(self):
-                return self._headers
-            
-            @property
-            def text(self):
-                return str(self.error)
-        
-        return ErrorResponse(e)
+    except (requests.RequestException, ValueError) as e:
+        return _search_summary(None, status_code=500, headers={}, text=str(e))
+
+@st.cache_data(show_spinner=False)
+def top_results(results: List[Dict], sort_by: str, limit: int) -> List[Dict]:
+    """Return the first limit results under the selected ordering"""
+    # heapq selects the top k in O(n log k) rather than sorting everything
+    if sort_by == "Date":
+        return heapq.nlargest(
+            limit,
+            results,
+            key=lambda x: x.get('metadata', {}).get('created_at', '')
+        )
+    elif sort_by == "Name":
+        return heapq.nsmallest(
+            limit,
+            results,
+            key=lambda x: x.get('metadata', {}).get('file_name', '').lower()
+        )
+    # The API returns neighbors already ordered by similarity
+    return results[:limit]
 
 def clamp(value, min_val=0.0, max_val=1.0):
     """Clamp a value between min and max values."""
@@ -434,33 +632,297 @@ def clamp(value, min_val=0.0, max_val=1.0):
 
 def init_session_state():
     """Initialize session state variables"""
-    if 'search_performed' not in st.session_state:
-        st.session_state.search_performed = False
-    if 'total_results' not in st.session_state:
-        st.session_state.total_results = 0
-    if 'query' not in st.session_state:
-        st.session_state.query = ""
-    if 'current_results' not in st.session_state:
-        st.session_state.current_results = []
+    if 'current_search' not in st.session_state:
+        st.session_state.current_search = None
     if 'max_results' not in st.session_state:
         st.session_state.max_results = 20
+    if 'page' not in st.session_state:
+        st.session_state.page = 0
+    if 'results_by_key' not in st.session_state:
+        st.session_state.results_by_key = {}
+    if 'html_by_id' not in st.session_state:
+        st.session_state.html_by_id = {}
+    if 'bytes_by_id' not in st.session_state:
+        st.session_state.bytes_by_id = {}
+
+def search_key(query: str, use_mock: bool) -> str:
+    """Stable key for a search's inputs"""
+    return hashlib.blake2b(f"{query}|{use_mock}".encode(), digest_size=16).hexdigest()
+
+def session_search(query: str, use_mock: bool, retry_failed: bool) -> Tuple[Dict, bool]:
+    """
+    Response for a search, reused from this session until it expires and
+    re-run otherwise (or if it failed and retry_failed is set). Returns the
+    response and whether it was just fetched; the search becomes the session's
+    most recent entry, evicting the oldest past the cap.
+    """
+    key = search_key(query, use_mock)
+    results_by_key = st.session_state.results_by_key
+    entry = results_by_key.pop(key, None)
+    fetched = (
+        entry is None
+        or time.time() - entry['fetched_at'] >= SESSION_SEARCH_TTL
+        or (retry_failed and not entry['response']['ok'])
+    )
+    if fetched:
+        with st.spinner("🔍 Searching for images..."):
+            entry = {'response': search_images(query, use_mock=use_mock), 'fetched_at': time.time()}
+        logger.info(f"Search for {query!r} returned status {entry['response']['status_code']}")
+
+    results_by_key[key] = entry
+    if len(results_by_key) > SESSION_SEARCH_CACHE_SIZE:
+        del results_by_key[next(iter(results_by_key))]
+    return entry['response'], fetched
 
-def reset_search_state():
-    """Reset search-related state when performing a new search"""
-    st.session_state.search_performed = True
-    st.session_state.current_results = []
-    st.session_state.total_results = 0
+def response_results(response: Dict) -> List[Dict]:
+    """Results of a search response, empty if the search failed"""
+    return (response['body'] or {}).get('results', []) if response['ok'] else []
 
 def min_max_scale(scores):
     """
     Normalize scores using min-max scaling.
     Returns a value between 0 and 1.
     """
-    min_score = min(scores)
-    max_score = max(scores)
+    scores = np.asarray(scores, dtype=np.float64)
+    min_score, max_score = scores.min(), scores.max()
     if max_score == min_score:
-        return [1.0] * len(scores)  # If all scores are equal, return 1.0
-    return [(x - min_score) / (max_score - min_score) for x in scores]
+        return np.ones_like(scores).tolist()  # If all scores are equal, return 1.0
+    return ((scores - min_score) / (max_score - min_score)).tolist()
+
+def image_source(result: Dict) -> str:
+    """Return a result's image URL, preferring one the API already signed"""
+    metadata = result.get('metadata', {})
+    return metadata.get('signed_image_url') or metadata.get('processed_image_path', '')
+
+def parse_gcs_path(image_url: str) -> Tuple[str, str]:
+    """Split a gs:// path into its bucket and blob name"""
+    parsed = urlparse(image_url)
+    return parsed.netloc, parsed.path.lstrip('/')
+
+def sign_urls(pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+    """Sign each distinct (bucket, blob) pair once, overlapping the IAM round-trips"""
+    unique_pairs = list(dict.fromkeys(pairs))
+    if len(unique_pairs) <= 1:
+        return {pair: get_signed_url(*pair) for pair in unique_pairs}
+    # Refresh Compute Engine credentials once up front rather than letting
+    # every worker find them expired at the same time
+    credentials, _ = get_credentials()
+    if isinstance(credentials, compute_engine.Credentials):
+        try:
+            refresh_credentials(credentials)
+        except Exception as e:
+            logger.warning(f"Could not refresh credentials before signing: {str(e)}")
+    # Workers share the script's run context so signing errors still reach the page
+    with ThreadPoolExecutor(
+        max_workers=min(SIGNING_WORKERS, len(unique_pairs)),
+        initializer=add_script_run_ctx,
+        initargs=(None, get_script_run_ctx())
+    ) as executor:
+        return dict(zip(unique_pairs, executor.map(lambda pair: get_signed_url(*pair), unique_pairs)))
+
+def resolve_image_urls(results: List[Dict]) -> List[str]:
+    """
+    Return fetchable URLs for a page of results, signing all of the page's
+    gs:// paths in one pass before any download starts
+    """
+    sources = [image_source(result) for result in results]
+    # Parse each gs:// path once and reuse it for the lookup below
+    gcs_paths = {url: parse_gcs_path(url) for url in sources if url.startswith('gs://')}
+    signed = sign_urls(list(gcs_paths.values()))
+    return [signed[gcs_paths[url]] if url in gcs_paths else url for url in sources]
+
+def fetch_image_bytes(url: str) -> bytes:
+    """Download an image's raw bytes"""
+    response = get_http_session().get(url, timeout=30)
+    response.raise_for_status()
+    return response.content
+
+# Keyed by the stable result ID and size only (the leading underscore keeps
+# the URL out of the cache key), since signed URLs rotate while the image
+# doesn't. Caching the thumbnail rather than the original keeps each entry
+# to tens of KB instead of several MB
+@st.cache_data(ttl=86400, max_entries=2000, show_spinner=False)
+def fetch_thumbnail(blob_id: str, _url: str, size: Tuple[int, int] = THUMBNAIL_SIZE) -> bytes:
+    """Download an image and downscale it to a WEBP thumbnail for the grid"""
+    with Image.open(BytesIO(fetch_image_bytes(_url))) as image:
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        image.thumbnail(size, Image.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, 'WEBP', quality=80)
+    return buffer.getvalue()
+
+def _fetch_image(blob_id: str, url: str):
+    """Fetch one thumbnail, returning the exception in place of the bytes on failure"""
+    try:
+        return fetch_thumbnail(blob_id, url)
+    except Exception as e:
+        return e
+
+def fetch_images(results: List[Dict]) -> List:
+    """
+    Resolve and download the images for a list of results, overlapping the
+    network round-trips. Returns image bytes or the exception for each result.
+    """
+    # Images already shown this search are kept in the session, so reruns skip
+    # both signing and the download cache lookup
+    bytes_by_id = st.session_state.bytes_by_id
+    images = [bytes_by_id.get(result.get('id')) for result in results]
+    missing = [idx for idx, image in enumerate(images) if image is None]
+    if not missing:
+        return images
+
+    pending = [results[idx] for idx in missing]
+    urls = resolve_image_urls(pending)
+    blob_ids = [result.get('id') or url for result, url in zip(pending, urls)]
+    # Downloads release the GIL while waiting on the socket, so threads overlap them
+    with ThreadPoolExecutor(max_workers=min(32, len(urls))) as executor:
+        fetched = list(executor.map(_fetch_image, blob_ids, urls))
+
+    for idx, image in zip(missing, fetched):
+        images[idx] = image
+        blob_id = results[idx].get('id')
+        if blob_id and not isinstance(image, BaseException):
+            bytes_by_id[blob_id] = image
+    return images
+
+def _render_tags(values) -> str:
+    """Render a list of tags, or a comma-separated string of them, as HTML chips"""
+    if isinstance(values, str):  # Handle legacy format
+        values = values.split(',')
+    return " ".join([
+        f'<span class="tag">{value.strip()}</span>'
+        for value in values or [] if value and isinstance(value, str)
+    ])
+
+def render_result_tags(result: Dict) -> Tuple[str, str]:
+    """Characteristics and objects HTML for a result"""
+    metadata = result.get('metadata', {})
+    return (
+        _render_tags(metadata.get('characteristics')),
+        _render_tags(metadata.get('objects'))
+    )
+
+def render_result_card(result: Dict, normalized_score: float, image):
+    """Render a single result: image, similarity bar and metadata details"""
+    if isinstance(image, requests.HTTPError):
+        st.error(f"Failed to load image: {image.response.status_code}")
+    elif isinstance(image, BaseException):
+        st.error(f"Error loading image: {str(image)}")
+    else:
+        # Image card with hover effect
+        st.image(
+            BytesIO(image),
+            use_container_width=True
+        )
+
+    # Display both raw and normalized similarity scores
+    raw_similarity = result.get('similarity_score', 0)
+    st.progress(normalized_score, 
+              text=f"Similarity: {raw_similarity:.3f} (Normalized: {normalized_score:.0%})")
+
+    # Metadata expansion
+    with st.expander("Details"):
+        metadata = result.get('metadata', {})
+
+        if metadata:
+            st.markdown('<p class="metadata-text"><strong>Context</strong></p>', unsafe_allow_html=True)
+            st.markdown(f'<p class="metadata-text">{metadata.get("context", "N/A")}</p>', unsafe_allow_html=True)
+
+            tags_html, objects_html = (
+                st.session_state.html_by_id.get(result.get('id'))
+                or render_result_tags(result)
+            )
+
+            st.markdown('<p class="metadata-text"><strong>Characteristics</strong></p>', unsafe_allow_html=True)
+            st.markdown(tags_html, unsafe_allow_html=True)
+
+            st.markdown('<p class="metadata-text"><strong>Objects</strong></p>', unsafe_allow_html=True)
+            st.markdown(objects_html, unsafe_allow_html=True)
+
+            st.markdown('<p class="metadata-text"><strong>Properties</strong></p>', unsafe_allow_html=True)
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown(f'<p class="metadata-text">Type: {metadata.get("content_type", "N/A")}</p>', unsafe_allow_html=True)
+            with col2:
+                st.markdown(f'<p class="metadata-text">Created: {metadata.get("created_at", "N/A")}</p>', unsafe_allow_html=True)
+
+def change_page(delta: int):
+    """Move the results grid by delta pages"""
+    st.session_state.page += delta
+
+def render_display_settings() -> str:
+    """Render the sort and result-count controls; returns the sort order"""
+    sort_col, max_col = st.columns([1, 2])
+    with sort_col:
+        sort_by = st.selectbox("Sort results by", 
+                             ["Similarity", "Date", "Name"],
+                             help="Choose how to sort the search results")
+    with max_col:
+        st.session_state.max_results = st.select_slider(
+            "Maximum results to display",
+            options=[5, 10, 20, 50, 100],
+            value=st.session_state.max_results,
+            key="max_results_slider",
+            help="Select how many results to show"
+        )
+    return sort_by
+
+# A fragment, so sorting, resizing and paging rerun only the grid rather than
+# the whole script; its controls live inside it because widgets outside a
+# fragment (including the sidebar) always trigger a full rerun
+@st.fragment
+def render_results(results: List[Dict]):
+    """Render the current page of the sorted, truncated result grid"""
+    sort_by = render_display_settings()
+    
+    # Sort and limit results based on user selection
+    total_results = len(results)
+    display_results = top_results(results, sort_by, st.session_state.max_results)
+    
+    # Display results count with material design
+    st.markdown(f"""
+        <div class="results-count">
+            📸 Showing {len(display_results)} of {total_results} images
+        </div>
+        """, 
+        unsafe_allow_html=True
+    )
+    
+    # Calculate normalized scores across all displayed results so they stay
+    # comparable from page to page
+    similarity_scores = [result.get('similarity_score', 0) for result in display_results]
+    normalized_scores = min_max_scale(similarity_scores)
+    
+    # Only render the current page
+    num_pages = max(1, math.ceil(len(display_results) / RESULTS_PER_PAGE))
+    page = min(max(st.session_state.page, 0), num_pages - 1)
+    st.session_state.page = page
+    page_slice = slice(page * RESULTS_PER_PAGE, (page + 1) * RESULTS_PER_PAGE)
+    
+    if num_pages > 1:
+        prev_col, page_col, next_col = st.columns([1, 3, 1])
+        with prev_col:
+            st.button("← Previous", on_click=change_page, args=(-1,),
+                      disabled=page == 0, use_container_width=True)
+        with page_col:
+            st.markdown(f'<p class="metadata-text" style="text-align: center">Page {page + 1} of {num_pages}</p>',
+                        unsafe_allow_html=True)
+        with next_col:
+            st.button("Next →", on_click=change_page, args=(1,),
+                      disabled=page == num_pages - 1, use_container_width=True)
+    
+    # Download the page's images concurrently before rendering
+    page_results = display_results[page_slice]
+    with st.spinner("Loading images..."):
+        images = fetch_images(page_results)
+    
+    # Create grid layout with 5 columns for better alignment
+    cols = st.columns(5)
+    page_items = zip(page_results, normalized_scores[page_slice], images)
+    for idx, (result, normalized_score, image) in enumerate(page_items):
+        with cols[idx % 5]:
+            with st.container():
+                render_result_card(result, normalized_score, image)
 
 def main():
     # Initialize session state
@@ -470,26 +932,6 @@ def main():
     with st.sidebar:
         st.title("⚙️ Settings")
         use_mock = st.toggle("Use mock data", value=False)
-        st.divider()
-        st.markdown("### Display Settings")
-        # Add maximum results selector
-        max_results = st.select_slider(
-            "Maximum results to display",
-            options=[5, 10, 20, 50, 100],
-            value=st.session_state.max_results,
-            key="max_results_slider",
-            help="Select how many results to show"
-        )
-        
-        # Update max results if changed
-        if max_results != st.session_state.max_results:
-            st.session_state.max_results = max_results
-            st.rerun()
-            
-        st.divider()
-        sort_by = st.selectbox("Sort results by", 
-                             ["Similarity", "Date", "Name"],
-                             help="Choose how to sort the search results")
     
     # Main content
     st.title("🔍 Image Search")
@@ -505,154 +947,64 @@ def main():
         with col2:
             search_button = st.button("Search", type="primary", use_container_width=True)
     
-    # Create tabs for results and logging
-    results_tab, logging_tab = st.tabs(["Results", "Logging"])
+    # Create tabs for results and, in debug mode, logging
+    if SEARCH_DEBUG:
+        results_tab, logging_tab = st.tabs(["Results", "Logging"])
+    else:
+        results_tab = st.container()
     
     # Handle search
+    response = None
     if search_button and query:
-        # Reset search state for new queries
-        if query != st.session_state.query:
-            reset_search_state()
-            st.session_state.query = query
-            
-        with st.spinner("🔍 Searching for images..."):
-            response = search_images(query, use_mock=use_mock)
-            
-            # Show response details in logging tab
+        # Repeating a search in this session reuses its response without
+        # another round-trip; failed searches are retried
+        if (query, use_mock) != st.session_state.current_search:
+            st.session_state.current_search = (query, use_mock)
+            st.session_state.page = 0
+            # Only hold the current search's images in the session
+            st.session_state.bytes_by_id = {}
+        response, _ = session_search(query, use_mock, retry_failed=True)
+        refresh_tags = True
+    elif search_button:
+        st.warning("Please enter a search query")
+    
+    # Render the current search from session state, so sort, display and
+    # paging changes don't require pressing Search again; it is re-run once
+    # its entry expires
+    if response is None and st.session_state.current_search is not None:
+        response, refresh_tags = session_search(*st.session_state.current_search, retry_failed=False)
+    
+    if response is not None and refresh_tags:
+        # Build each card's tag HTML once per response rather than on every rerun
+        st.session_state.html_by_id = {
+            result['id']: render_result_tags(result)
+            for result in response_results(response) if result.get('id')
+        }
+    
+    if response is not None:
+        # Show response details in logging tab
+        if SEARCH_DEBUG:
             with logging_tab:
                 st.subheader("Response Details")
-                st.write("Response Status:", response.status_code)
-                st.write("Response Headers:", dict(response.headers))
-                try:
-                    st.json(response.json())
-                except requests.exceptions.JSONDecodeError:
+                st.write("Response Status:", response['status_code'])
+                st.write("Response Headers:", response['headers'])
+                if response['body'] is not None:
+                    st.json(response['body'])
+                else:
                     st.error("Could not decode JSON response")
                     st.text("Raw Response:")
-                    st.text(response.text)
-            
-            with results_tab:
-                if response.ok:
-                    results = response.json().get('results', [])
-                    
-                    if results:
-                        # Update current results directly
-                        st.session_state.current_results = results
-                        st.session_state.total_results = len(results)
-                        
-                        display_results = st.session_state.current_results
-                        
-                        # Sort results
-                        if sort_by == "Similarity":
-                            display_results.sort(key=lambda x: x.get('similarity_score', 0), reverse=True)
-                        elif sort_by == "Date":
-                            display_results.sort(
-                                key=lambda x: x.get('metadata', {}).get('created_at', ''),
-                                reverse=True
-                            )
-                        elif sort_by == "Name":
-                            display_results.sort(
-                                key=lambda x: x.get('metadata', {}).get('file_name', '').lower()
-                            )
-                        
-                        # Limit results based on user selection
-                        total_results = len(display_results)
-                        display_results = display_results[:st.session_state.max_results]
-                        
-                        # Display results count with material design
-                        st.markdown(f"""
-                            <div class="results-count">
-                                📸 Showing {len(display_results)} of {total_results} images
-                            </div>
-                            """, 
-                            unsafe_allow_html=True
-                        )
-                        
-                        # Calculate normalized scores for all results
-                        similarity_scores = [result.get('similarity_score', 0) for result in display_results]
-                        normalized_scores = min_max_scale(similarity_scores)
-                        
-                        # Create grid layout with 5 columns for better alignment
-                        cols = st.columns(5)
-                        for idx, (result, normalized_score) in enumerate(zip(display_results, normalized_scores)):
-                            with cols[idx % 5]:
-                                with st.container():
-                                    placeholder = st.empty()
-                                    with placeholder:
-                                        st.spinner("Loading image...")  # Shows while image loads
-                                    # Get image URL from processed_image_path
-                                    image_url = result.get('metadata', {}).get('processed_image_path', '')
-                                    if image_url.startswith('gs://'):
-                                        # Parse bucket and blob name from GCS path
-                                        bucket_name = image_url.split('/')[2]
-                                        blob_name = '/'.join(image_url.split('/')[3:])
-                                        try:
-                                            # Generate signed URL for private bucket access
-                                            image_url = get_signed_url(bucket_name, blob_name)
-                                        except Exception as e:
-                                            st.error(f"Error generating signed URL: {str(e)}")
-                                            continue
-                                    
-                                    try:
-                                        # Load image from URL
-                                        response = requests.get(image_url)
-                                        if response.status_code == 200:
-                                            image_bytes = BytesIO(response.content)
-                                            # Image card with hover effect
-                                            st.image(
-                                                image_bytes,
-                                                use_container_width=True
-                                            )
-                                        else:
-                                            st.error(f"Failed to load image: {response.status_code}")
-                                    except Exception as e:
-                                        st.error(f"Error loading image: {str(e)}")
-                                    
-                                    # Display both raw and normalized similarity scores
-                                    raw_similarity = result.get('similarity_score', 0)
-                                    st.progress(normalized_score, 
-                                              text=f"Similarity: {raw_similarity:.3f} (Normalized: {normalized_score:.0%})")
-                                    
-                                    # Metadata expansion
-                                    with st.expander("Details"):
-                                        metadata = result.get('metadata', {})
-                                        
-                                        if metadata:
-                                            st.markdown('<p class="metadata-text"><strong>Context</strong></p>', unsafe_allow_html=True)
-                                            st.markdown(f'<p class="metadata-text">{metadata.get("context", "N/A")}</p>', unsafe_allow_html=True)
-                                            
-                                            st.markdown('<p class="metadata-text"><strong>Characteristics</strong></p>', unsafe_allow_html=True)
-                                            characteristics = metadata.get('characteristics', [])
-                                            if isinstance(characteristics, str):  # Handle legacy format
-                                                characteristics = characteristics.split(',')
-                                            tags_html = " ".join([
-                                                f'<span class="tag">{tag.strip()}</span>' 
-                                                for tag in characteristics if tag and isinstance(tag, str)
-                                            ])
-                                            st.markdown(tags_html, unsafe_allow_html=True)
-                                            
-                                            st.markdown('<p class="metadata-text"><strong>Objects</strong></p>', unsafe_allow_html=True)
-                                            objects = metadata.get('objects', [])
-                                            if isinstance(objects, str):  # Handle legacy format
-                                                objects = objects.split(',')
-                                            objects_html = " ".join([
-                                                f'<span class="tag">{obj.strip()}</span>'
-                                                for obj in objects if obj and isinstance(obj, str)
-                                            ])
-                                            st.markdown(objects_html, unsafe_allow_html=True)
-                                            
-                                            st.markdown('<p class="metadata-text"><strong>Properties</strong></p>', unsafe_allow_html=True)
-                                            col1, col2 = st.columns(2)
-                                            with col1:
-                                                st.markdown(f'<p class="metadata-text">Type: {metadata.get("content_type", "N/A")}</p>', unsafe_allow_html=True)
-                                            with col2:
-                                                st.markdown(f'<p class="metadata-text">Created: {metadata.get("created_at", "N/A")}</p>', unsafe_allow_html=True)
-                    else:
-                        st.warning("No results found")
+                    st.text(response['text'])
+        
+        with results_tab:
+            if response['ok']:
+                results = response_results(response)
+                if results:
+                    render_results(results)
                 else:
-                    st.error(f"Error: {response.status_code} - {response.text}")
-    elif search_button:
-        st.warning("Please enter a search query")
-    else:
+                    st.warning("No results found")
+            else:
+                st.error(f"Error: {response['status_code']} - {response['text']}")
+    elif not search_button:
         # Show welcome message when no search is performed
         with results_tab:
             st.markdown("""
@@ -1,39 +1,90 @@
-from typing import List, Dict
-import random
+from typing import List, Dict, Tuple
+from functools import lru_cache
+import itertools
+import zlib
+import numpy as np
+
+# Realistic image categories and their tags, built once at import
+CATEGORIES = (
+    ("nature", ("landscape", "mountain", "forest", "ocean", "sunset")),
+    ("urban", ("city", "architecture", "street", "building", "skyline")),
+    ("wildlife", ("animal", "bird", "mammal", "underwater", "safari")),
+    ("people", ("portrait", "crowd", "fashion", "sports", "lifestyle")),
+    ("food", ("cuisine", "restaurant", "cooking", "ingredients", "dishes"))
+)
+
+# Every ordered choice of 3 tags from a 5-tag pool (60 in all), so picking a
+# result's tags is one integer draw, distributed like random.sample(tags, 3)
+_TAG_PERMS = tuple(itertools.permutations(range(len(CATEGORIES[0][1])), 3))
+
+# Metadata fields that are the same for every mock result
+_META_PROTO = {
+    "date_added": "2024-04-15",
+    "size": "2.4 MB",
+    "dimensions": "1920x1080"
+}
+
+# Number of mock results per search (3x3 grid)
+NUM_RESULTS = 9
+
+# Every string a result can carry, formatted once at import and looked up by
+# (category index, result index) in the loop
+_PATHS = {
+    (c, i): f"/path/to/{category}/{i+1}.jpg"
+    for c, (category, _) in enumerate(CATEGORIES) for i in range(NUM_RESULTS)
+}
+_URLS = tuple(f"https://picsum.photos/400/300?random={i}" for i in range(NUM_RESULTS))  # Random placeholder images
+_DESCS = tuple(f"A beautiful {category} photograph" for category, _ in CATEGORIES)
+
+def _sample_core(
+    n: int,
+    rng: np.random.Generator
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Draw the numeric part of n mock results in batched NumPy calls.
+    Returns category indices, tag permutation indices, similarities and
+    their descending order.
+    """
+    category_idx = rng.integers(0, len(CATEGORIES), n)
+    perm_idx = rng.integers(0, len(_TAG_PERMS), n)
+    similarities = np.round(rng.uniform(0.60, 0.99, n), 2)
+    # Stable descending order, matching a reverse sort by similarity
+    order = np.argsort(-similarities, kind='stable')
+    return category_idx, perm_idx, similarities, order
+
+@lru_cache(maxsize=128)
+def _sample_for_query(query: str) -> Tuple[tuple, tuple, tuple, tuple]:
+    """
+    Draws for a query, seeded from it so a query always gets the same results.
+    crc32 rather than hash(), which is salted per process.
+    """
+    rng = np.random.default_rng(zlib.crc32(query.encode('utf-8')))
+    return tuple(tuple(values.tolist()) for values in _sample_core(NUM_RESULTS, rng))
 
 def get_mock_results(query: str) -> List[Dict]:
     """
-    Return mock search results for testing the UI
+    Return mock search results for testing the UI, deterministic per query
     """
-    # List of realistic image categories
-    categories = [
-        ("nature", ["landscape", "mountain", "forest", "ocean", "sunset"]),
-        ("urban", ["city", "architecture", "street", "building", "skyline"]),
-        ("wildlife", ["animal", "bird", "mammal", "underwater", "safari"]),
-        ("people", ["portrait", "crowd", "fashion", "sports", "lifestyle"]),
-        ("food", ["cuisine", "restaurant", "cooking", "ingredients", "dishes"])
-    ]
+    # Results are rebuilt from the cached draws on every call, so callers
+    # never share (and can't mutate) each other's dicts
+    category_idx, perm_idx, similarities, order = _sample_for_query(query)
     
-    # Generate 9 mock results (3x3 grid)
+    # Build the results already ordered by similarity
     mock_results = []
-    for i in range(9):
-        category, tags = random.choice(categories)
-        similarity = round(random.uniform(0.60, 0.99), 2)
+    for i in order:
+        c = category_idx[i]
+        tags = CATEGORIES[c][1]
         
         result = {
-            "image_path": f"/path/to/{category}/{i+1}.jpg",
-            "image_url": f"https://picsum.photos/400/300?random={i}",  # Random placeholder image
-            "similarity": similarity,
+            "image_path": _PATHS[(c, i)],
+            "image_url": _URLS[i],
+            "similarity": similarities[i],
             "metadata": {
-                "description": f"A beautiful {category} photograph",
-                "tags": random.sample(tags, 3),
-                "date_added": "2024-04-15",
-                "size": "2.4 MB",
-                "dimensions": "1920x1080"
+                "description": _DESCS[c],
+                "tags": [tags[j] for j in _TAG_PERMS[perm_idx[i]]],
+                **_META_PROTO
             }
         }
         mock_results.append(result)
     
-    # Sort by similarity by default
-    mock_results.sort(key=lambda x: x['similarity'], reverse=True)
     return mock_results
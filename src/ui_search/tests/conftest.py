@@ -0,0 +1,6 @@
+import os
+import sys
+
+# app.py refuses to load without an API endpoint; tests never call it
+os.environ.setdefault('API_ENDPOINT', 'http://localhost:8080')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,44 @@
+from app import top_results
+
+
+def result(i, file_name, created_at):
+    return {'id': f'doc{i}', 'metadata': {'file_name': file_name, 'created_at': created_at}}
+
+
+RESULTS = [
+    result(0, 'c.jpg', '2024-01-02'),
+    result(1, 'a.jpg', '2024-01-03'),
+    result(2, 'b.jpg', '2024-01-01'),
+]
+
+
+def test_similarity_keeps_api_order():
+    assert top_results(RESULTS, "Similarity", 2) == RESULTS[:2]
+    assert top_results(RESULTS, "Similarity", 10) == RESULTS
+
+
+def test_name_and_date_orderings():
+    assert [r['id'] for r in top_results(RESULTS, "Name", 2)] == ['doc1', 'doc2']
+    assert [r['id'] for r in top_results(RESULTS, "Date", 2)] == ['doc1', 'doc0']
+
+
+def test_signed_url_is_resigned_once_too_close_to_expiry(monkeypatch):
+    import app
+
+    now = [1000.0]
+    signed = []
+
+    def sign(bucket_name, blob_name, expiration):
+        signed.append(now[0])
+        return f"https://storage.googleapis.com/{bucket_name}/{blob_name}?X-Goog-Signature={len(signed)}"
+
+    monkeypatch.setattr(app.time, "time", lambda: now[0])
+    monkeypatch.setattr(app, "_sign_url", sign)
+    app._signed_url_cached.clear()
+
+    first = app.get_signed_url("bucket", "a.jpg", 3600)
+    now[0] += 3600 - app.SIGNED_URL_MIN_REMAINING - 1
+    assert app.get_signed_url("bucket", "a.jpg", 3600) == first
+    now[0] += 2
+    assert app.get_signed_url("bucket", "a.jpg", 3600) != first
+    assert signed == [1000.0, 1000.0 + 3600 - app.SIGNED_URL_MIN_REMAINING + 1]
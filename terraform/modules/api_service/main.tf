@@ -61,6 +61,14 @@ resource "google_storage_bucket_iam_member" "run_service_account_object_admin" {
   member = "serviceAccount:${google_cloud_run_v2_service.search_api_app.template[0].service_account}"
 }
 
+# Let the Cloud Run service account sign URLs as itself through IAM signBlob
+# (used when the API runs with SIGN_IMAGE_URLS enabled)
+resource "google_service_account_iam_member" "run_service_account_token_creator" {
+  service_account_id = "projects/${var.project_id}/serviceAccounts/${var.service_account}"
+  role               = "roles/iam.serviceAccountTokenCreator"
+  member             = "serviceAccount:${var.service_account}"
+}
+
 # IAM Policy for All Organization Users
 resource "google_cloud_run_service_iam_policy" "all_users" {
   project     = var.project_id
@@ -12,6 +12,9 @@ resource "google_vertex_ai_index" "image_search_index" {
       approximate_neighbors_count = 150 
       distance_measure_type = "DOT_PRODUCT_DISTANCE"
       shard_size = "SHARD_SIZE_SMALL"
+      # Tree-AH (ScaNN) already scores candidates from compressed
+      # asymmetric-hashing codes, which is the index-side quantization; the
+      # query API only accepts float feature vectors, so queries stay float32
       algorithm_config {
         tree_ah_config {
           leaf_node_embedding_count = 500 